@@ -35,9 +35,22 @@ module.exports = (sequelize) => {
       type: DataTypes.INTEGER,
       allowNull: false
     },
+    status: {
+      type: DataTypes.ENUM('processing', 'completed', 'failed'),
+      defaultValue: 'completed'
+    },
+    jobId: {
+      type: DataTypes.STRING,
+      allowNull: true,
+      comment: 'AI service job id while the analysis is processing'
+    },
+    error: {
+      type: DataTypes.TEXT,
+      allowNull: true
+    },
     overallScore: {
       type: DataTypes.DECIMAL(3, 1),
-      allowNull: false,
+      allowNull: true,
       validate: {
         min: 0,
         max: 100
@@ -45,7 +58,7 @@ module.exports = (sequelize) => {
     },
     feedback: {
       type: DataTypes.JSONB,
-      allowNull: false,
+      allowNull: true,
       comment: 'Detailed feedback for each form checkpoint'
     },
     improvements: {
@@ -54,7 +67,7 @@ module.exports = (sequelize) => {
     },
     riskLevel: {
       type: DataTypes.ENUM('low', 'medium', 'high'),
-      allowNull: false
+      allowNull: true
     },
     repCount: {
       type: DataTypes.INTEGER,
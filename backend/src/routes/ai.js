@@ -2,7 +2,7 @@ const express = require('express');
 const axios = require('axios');
 const multer = require('multer');
 const path = require('path');
-const { body, validationResult } = require('express-validator');
+const { body, param, validationResult } = require('express-validator');
 const auth = require('../middleware/auth');
 const { User, Workout, Exercise, FormAnalysis } = require('../database/models');
 const logger = require('../utils/logger');
@@ -172,34 +172,92 @@ router.post('/analyze-form', auth, upload.single('video'), [
     formData.append('exercise_name', exercise.name);
     formData.append('form_checkpoints', JSON.stringify(exercise.formCheckpoints));
 
-    const aiResponse = await axios.post(
-      `${process.env.PYTHON_AI_SERVICE_URL}/analyze-form`,
-      formData,
-      {
-        headers: {
-          'Content-Type': 'multipart/form-data'
-        }
-      }
-    );
+    // Elite members get the most accurate (and most CPU-hungry) pose model
+    const analysisTier = user.role === 'elite' ? 'accurate' : 'balanced';
 
-    const analysisData = aiResponse.data;
+    // Long videos take minutes, so the app gets an id to poll instead of
+    // holding its request open for the whole analysis
+    const { data: job } = await axios.post(FORM_ANALYSIS_JOBS_URL(), formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data'
+      },
+      params: {
+        exercise_name: exercise.name,
+        tier: analysisTier
+      }
+    });
 
-    // Save form analysis to database
     const formAnalysis = await FormAnalysis.create({
       userId: req.userId,
       exerciseId,
       setNumber,
-      overallScore: analysisData.overall_score,
-      feedback: analysisData.feedback,
-      improvements: analysisData.improvements,
-      riskLevel: analysisData.risk_level,
-      videoPath: req.file.path,
-      analysisData: analysisData
+      status: 'processing',
+      jobId: job.job_id,
+      videoPath: req.file.path
+    });
+
+    logger.info(`Form analysis ${formAnalysis.id} started for user ${req.userId}, exercise ${exerciseId}`);
+
+    res.status(202).json({
+      message: 'Form analysis started',
+      analysisId: formAnalysis.id,
+      status: formAnalysis.status,
+      progress: job.progress
+    });
+  } catch (error) {
+    logger.error('Form analysis error:', error);
+    if (error.response?.status === 503 || error.response?.status === 429) {
+      return res.status(503).json({ message: 'AI service temporarily unavailable' });
+    }
+    if (error.response?.status === 413) {
+      return res.status(413).json({ message: 'Video is too large or too long' });
+    }
+    res.status(500).json({ message: 'Failed to analyze form' });
+  }
+});
+
+// Form Analysis Status and Result
+router.get('/analyze-form/:analysisId', auth, [
+  param('analysisId').isUUID()
+], async (req, res) => {
+  try {
+    const errors = validationResult(req);
+    if (!errors.isEmpty()) {
+      return res.status(400).json({ errors: errors.array() });
+    }
+
+    let formAnalysis = await FormAnalysis.findOne({
+      where: { id: req.params.analysisId, userId: req.userId }
     });
+    if (!formAnalysis) {
+      return res.status(404).json({ message: 'Form analysis not found' });
+    }
+
+    let progress = null;
+    if (formAnalysis.status === 'processing') {
+      ({ formAnalysis, progress } = await pollFormAnalysisJob(formAnalysis));
+    }
+
+    if (formAnalysis.status === 'processing') {
+      return res.status(202).json({
+        analysisId: formAnalysis.id,
+        status: formAnalysis.status,
+        progress
+      });
+    }
 
-    logger.info(`Form analysis completed for user ${req.userId}, exercise ${exerciseId}`);
+    if (formAnalysis.status === 'failed') {
+      return res.json({
+        analysisId: formAnalysis.id,
+        status: formAnalysis.status,
+        message: 'Form analysis failed',
+        error: formAnalysis.error
+      });
+    }
 
     res.json({
+      analysisId: formAnalysis.id,
+      status: formAnalysis.status,
       message: 'Form analysis completed',
       analysis: {
         overallScore: formAnalysis.overallScore,
@@ -209,11 +267,11 @@ router.post('/analyze-form', auth, upload.single('video'), [
       }
     });
   } catch (error) {
-    logger.error('Form analysis error:', error);
+    logger.error('Form analysis status error:', error);
     if (error.response?.status === 503) {
       return res.status(503).json({ message: 'AI service temporarily unavailable' });
     }
-    res.status(500).json({ message: 'Failed to analyze form' });
+    res.status(500).json({ message: 'Failed to get form analysis' });
   }
 });
 
@@ -308,6 +366,46 @@ router.get('/predict-progress', auth, async (req, res) => {
   }
 });
 
+// Form analysis runs as a job on the AI service. Each poll from the app checks
+// the job once, and the result is saved the first time it is seen completed.
+// Every AI service replica must share the job store (FORM_ANALYSIS_JOB_BACKEND=redis)
+// when more than one runs, or polls landing on another replica find no job.
+const FORM_ANALYSIS_JOBS_URL = () => `${process.env.PYTHON_AI_SERVICE_URL}/analyze-form/jobs`;
+
+async function pollFormAnalysisJob(formAnalysis) {
+  let job;
+  try {
+    ({ data: job } = await axios.get(`${FORM_ANALYSIS_JOBS_URL()}/${formAnalysis.jobId}`));
+  } catch (error) {
+    if (error.response?.status !== 404) {
+      throw error;
+    }
+    // Expired, or lost in an AI service restart
+    await formAnalysis.update({ status: 'failed', error: 'Form analysis job was lost' });
+    return { formAnalysis, progress: null };
+  }
+
+  if (job.status === 'completed') {
+    const { data: result } = await axios.get(`${FORM_ANALYSIS_JOBS_URL()}/${formAnalysis.jobId}/result`);
+    await formAnalysis.update({
+      status: 'completed',
+      overallScore: result.overall_score,
+      feedback: result.feedback,
+      improvements: result.improvements,
+      riskLevel: result.risk_level,
+      repCount: result.rep_count ?? 0,
+      analysisData: result,
+      processingTime: Date.now() - formAnalysis.createdAt.getTime()
+    });
+    logger.info(`Form analysis ${formAnalysis.id} completed for user ${formAnalysis.userId}`);
+  } else if (job.status === 'failed') {
+    await formAnalysis.update({ status: 'failed', error: job.error });
+    logger.error(`Form analysis ${formAnalysis.id} failed: ${job.error}`);
+  }
+
+  return { formAnalysis, progress: job.progress };
+}
+
 // Helper function to get user workout history
 async function getUserWorkoutHistory(userId) {
   const workouts = await Workout.findAll({
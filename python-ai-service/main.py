@@ -1,18 +1,22 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, BackgroundTasks, Request, Query, Depends, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Literal
 import uvicorn
 import os
+import asyncio
+import json
 from dotenv import load_dotenv
 
-from services.workout_generator import WorkoutGenerator
-from services.form_analyzer import FormAnalyzer
-from services.nutrition_analyzer import NutritionAnalyzer
-from services.progress_predictor import ProgressPredictor
-from services.coaching_ai import CoachingAI
-from models.workout_models import WorkoutRequest, WorkoutResponse
-from models.form_models import FormAnalysisResponse
+from services.analysis_pool import AnalysisPool, AnalysisPoolFull
+from services.video_upload import VideoTooLarge, UploadLimitMiddleware
+from services.result_cache import create_form_analysis_caches, create_workout_cache
+from services.analysis_jobs import FormAnalysisJobs, JobQueueFull
+from services.batch_analysis import FormAnalysisBatch, BatchTooLarge, MAX_BATCH_BYTES
+from services.service_registry import ServiceRegistry
+from models.workout_models import WorkoutRequest, WorkoutResponse, BulkWorkoutRequest
+from models.form_models import FormAnalysisResponse, FormAnalysisOptions, FormAnalysisJob
 from models.nutrition_models import NutritionRequest, NutritionResponse
 from models.progress_models import ProgressPredictionResponse
 
@@ -33,12 +37,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize AI services
-workout_generator = WorkoutGenerator()
-form_analyzer = FormAnalyzer()
-nutrition_analyzer = NutritionAnalyzer()
-progress_predictor = ProgressPredictor()
-coaching_ai = CoachingAI()
+# Cap single-upload bodies as they arrive, chunked ones included
+app.add_middleware(
+    UploadLimitMiddleware,
+    paths=("/analyze-form", "/analyze-form/landmarks", "/analyze-form/jobs")
+)
+# Starlette spools a whole multipart body before the route runs, so batches need a cap too
+app.add_middleware(UploadLimitMiddleware, paths=("/analyze-form/batch",), max_bytes=MAX_BATCH_BYTES)
+
+# Lightweight shared state is created now; the pool starts its workers on first use
+analysis_pool = AnalysisPool()
+form_analysis_caches = create_form_analysis_caches()
+workout_cache = create_workout_cache()
+live_form_sessions = set()
+MAX_LIVE_SESSIONS = int(os.getenv("FORM_LIVE_MAX_SESSIONS", 16))
+
+# AI services are built on first use; each factory does its own heavy imports
+def create_workout_generator():
+    from services.workout_generator import WorkoutGenerator
+    return WorkoutGenerator(result_cache=workout_cache)
+
+def create_form_analyzer():
+    from services.form_analyzer import FormAnalyzer
+    return FormAnalyzer(pool=analysis_pool, **form_analysis_caches)
+
+def create_training_states():
+    from services.training_state import create_training_state_store
+    return create_training_state_store()
+
+def create_nutrition_analyzer():
+    from services.nutrition_analyzer import NutritionAnalyzer
+    return NutritionAnalyzer()
+
+def create_progress_predictor():
+    from services.progress_predictor import ProgressPredictor
+    return ProgressPredictor()
+
+def create_coaching_ai():
+    from services.coaching_ai import CoachingAI
+    return CoachingAI()
+
+services = ServiceRegistry()
+services.register("workout_generator", create_workout_generator)
+services.register("form_analyzer", create_form_analyzer)
+services.register("form_analysis_jobs", FormAnalysisJobs, requires=["form_analyzer"])
+services.register("form_analysis_batch", FormAnalysisBatch, requires=["form_analyzer"])
+services.register("training_states", create_training_states)
+services.register("nutrition_analyzer", create_nutrition_analyzer)
+services.register("progress_predictor", create_progress_predictor)
+services.register("coaching_ai", create_coaching_ai)
+
+@app.on_event("startup")
+async def warm_up_services():
+    """Build the services named in AI_SERVICE_WARMUP in the background"""
+    # Cheap to build, and a store misconfigured for this deployment must stop
+    # startup rather than fail every workout request that has a user_id
+    await services.get("training_states")
+    
+    names = services.warmup_names()
+    if names:
+        asyncio.create_task(services.warm_up(names))
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    form_analysis_jobs = services.loaded("form_analysis_jobs")
+    if form_analysis_jobs is not None:
+        form_analysis_jobs.shutdown()
+    analysis_pool.shutdown()
+
+def form_analysis_options(
+    sampling: Optional[Literal["full", "fixed", "adaptive"]] = None,
+    target_fps: Optional[float] = Query(None, gt=0, le=120),
+    max_long_edge: Optional[int] = Query(None, ge=128, le=4096),
+    tier: Optional[Literal["fast", "balanced", "accurate"]] = None
+) -> FormAnalysisOptions:
+    """Per-request form analysis options shared by the sync and job endpoints"""
+    return FormAnalysisOptions(
+        sampling=sampling,
+        target_fps=target_fps,
+        max_long_edge=max_long_edge,
+        tier=tier
+    )
 
 @app.get("/")
 async def root():
@@ -48,57 +127,370 @@ async def root():
 async def health_check():
     return {
         "status": "healthy",
-        "services": {
-            "workout_generator": "ready",
-            "form_analyzer": "ready",
-            "nutrition_analyzer": "ready",
-            "progress_predictor": "ready",
-            "coaching_ai": "ready"
+        "services": services.status(),
+        "service_loading": services.stats(),
+        "form_analysis_pool": analysis_pool.stats(),
+        "live_form_sessions": {"active": len(live_form_sessions), "max": MAX_LIVE_SESSIONS},
+        "training_states": (
+            services.loaded("training_states").stats()
+            if services.loaded("training_states") is not None else None
+        ),
+        "exercise_catalog": (
+            services.loaded("workout_generator").catalog.stats()
+            if services.loaded("workout_generator") is not None else None
+        ),
+        "workout_cache": workout_cache.stats() if workout_cache is not None else None,
+        "form_analysis_cache": {
+            name: cache.stats()
+            for name, cache in form_analysis_caches.items()
+            if cache is not None
         }
     }
 
 @app.post("/generate-workout", response_model=WorkoutResponse)
-async def generate_workout(request: WorkoutRequest):
-    """Generate personalized AI workout based on user preferences and history"""
+async def generate_workout(request: WorkoutRequest, response: Response):
+    """Generate personalized AI workout based on user preferences and history.
+
+    With a ``user_id`` the user's stored training state is used instead of
+    ``user_history``. ``X-Training-State`` reports ``hit``, ``seeded`` (built
+    from this request's history) or ``miss``; after a miss the caller should
+    send the full history again.
+    """
     try:
+        workout_generator = await services.get("workout_generator")
+        training_state = None
+        if request.user_id:
+            training_states = await services.get("training_states")
+            training_state, status = await training_states.load(request.user_id, request.user_history)
+            response.headers["X-Training-State"] = status
+        
         workout = await workout_generator.generate_workout(
-            user_preferences=request.user_preferences,
+            user_preferences=request.user_preferences.model_dump(),
             duration=request.duration,
             difficulty=request.difficulty,
             equipment=request.equipment,
-            user_history=request.user_history
+            user_history=request.user_history,
+            training_state=training_state,
+            seed=request.seed
         )
         return workout
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate workout: {str(e)}")
 
+@app.post("/generate-workouts/bulk")
+async def generate_workouts_bulk(request: BulkWorkoutRequest):
+    """Generate many workouts in one call.
+
+    Send either ``requests``, independent workouts such as the nightly
+    next-day session for every subscriber, or a ``program`` of consecutive
+    days for one user where each session's fatigue carries into the next.
+    Results stream back as newline-delimited JSON in order: ``{"index",
+    "workout"}`` or ``{"index", "error"}`` per request, ``{"day", "date",
+    "workout"}`` per program session.
+    """
+    from services.workout_generator import BulkTooLarge
+    
+    try:
+        if bool(request.requests) == (request.program is not None):
+            raise HTTPException(status_code=400, detail="Provide either requests or a program")
+        
+        workout_generator = await services.get("workout_generator")
+        workout_requests = request.requests or [request.program]
+        # Resolve stored training states up front; generation itself never awaits
+        training_states = [None] * len(workout_requests)
+        if any(workout_request.user_id for workout_request in workout_requests):
+            store = await services.get("training_states")
+            loaded = await asyncio.gather(*(
+                store.load(workout_request.user_id, workout_request.user_history)
+                for workout_request in workout_requests if workout_request.user_id
+            ))
+            with_user = [i for i, workout_request in enumerate(workout_requests) if workout_request.user_id]
+            for i, (state, _) in zip(with_user, loaded):
+                training_states[i] = state
+        
+        if request.program is not None:
+            program = request.program
+            results = workout_generator.generate_program(
+                user_preferences=program.user_preferences.model_dump(),
+                days=program.days,
+                duration=program.duration,
+                difficulty=program.difficulty,
+                equipment=program.equipment,
+                user_history=program.user_history,
+                training_state=training_states[0],
+                start_date=program.start_date,
+                rest_weekdays=program.rest_weekdays,
+                seed=program.seed
+            )
+        else:
+            results = workout_generator.generate_batch([
+                {
+                    "user_preferences": workout_request.user_preferences.model_dump(),
+                    "duration": workout_request.duration,
+                    "difficulty": workout_request.difficulty,
+                    "equipment": workout_request.equipment,
+                    "user_history": workout_request.user_history,
+                    "training_state": training_state,
+                    "seed": workout_request.seed
+                }
+                for workout_request, training_state in zip(workout_requests, training_states)
+            ])
+    except HTTPException:
+        raise
+    except BulkTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to generate workouts: {str(e)}")
+    
+    # A plain generator: Starlette iterates it on a worker thread, so the
+    # CPU-bound generation never blocks the event loop
+    def stream_results():
+        for item in results:
+            if "workout" in item:
+                item["workout"] = WorkoutResponse(**item["workout"]).model_dump()
+            yield json.dumps(item) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/training-state/{user_id}/workouts")
+async def record_completed_workout(user_id: str, workout: Dict[str, Any]):
+    """Fold a completed workout into the user's training state"""
+    try:
+        training_states = await services.get("training_states")
+        state = await training_states.record(user_id, workout)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to record workout: {str(e)}")
+    
+    if state is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No training state for user; send user_history with the next workout generation"
+        )
+    return state.summary()
+
+@app.get("/training-state/{user_id}")
+async def get_training_state(user_id: str):
+    """Summarize the user's stored training state"""
+    training_states = await services.get("training_states")
+    state = await training_states.get(user_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="No training state for user")
+    return state.summary()
+
+@app.delete("/training-state/{user_id}", status_code=204)
+async def delete_training_state(user_id: str):
+    """Drop the user's training state, e.g. after their history was edited"""
+    training_states = await services.get("training_states")
+    await training_states.delete(user_id)
+
 @app.post("/analyze-form", response_model=FormAnalysisResponse)
 async def analyze_form(
     video: UploadFile = File(...),
     exercise_name: str = None,
-    form_checkpoints: str = None
+    form_checkpoints: str = None,
+    options: FormAnalysisOptions = Depends(form_analysis_options)
 ):
     """Analyze exercise form from video using computer vision"""
     try:
         if not video.content_type.startswith('video/'):
             raise HTTPException(status_code=400, detail="File must be a video")
         
-        video_content = await video.read()
-        
+        form_analyzer = await services.get("form_analyzer")
         analysis = await form_analyzer.analyze_form(
-            video_content=video_content,
+            video=video,
             exercise_name=exercise_name,
-            form_checkpoints=form_checkpoints
+            form_checkpoints=form_checkpoints,
+            options=options
         )
         
         return analysis
+    except HTTPException:
+        raise
+    except AnalysisPoolFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except VideoTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to analyze form: {str(e)}")
 
+@app.post("/analyze-form/landmarks", response_model=FormAnalysisResponse)
+async def analyze_form_landmarks(
+    request: Request,
+    exercise_name: str = None,
+    fps: float = Query(..., gt=0, le=240)
+):
+    """Analyze exercise form from landmarks computed on the client.
+
+    The request body is a raw little-endian float16 array of shape
+    ``(frames, 33, 4)`` holding MediaPipe x, y, z and visibility per frame,
+    sampled at ``fps``. No video is decoded and no pose model runs.
+    """
+    try:
+        form_analyzer = await services.get("form_analyzer")
+        analysis = await form_analyzer.analyze_landmarks(
+            data=await request.body(),
+            exercise_name=exercise_name,
+            fps=fps
+        )
+        
+        return analysis
+    except VideoTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to analyze form: {str(e)}")
+
+@app.post("/analyze-form/batch")
+async def analyze_form_batch(
+    videos: List[UploadFile] = File(...),
+    exercise_names: List[str] = Form(...),
+    options: FormAnalysisOptions = Depends(form_analysis_options)
+):
+    """Analyze a session's clips in one request.
+
+    ``exercise_names`` gives one exercise per video, in the same order.
+    Results stream back as newline-delimited JSON: one ``clip`` object per
+    video as soon as it finishes, then a ``summary`` of the whole session.
+    """
+    try:
+        if len(exercise_names) != len(videos):
+            raise HTTPException(status_code=400, detail="Provide one exercise name per video")
+        if any(not video.content_type.startswith('video/') for video in videos):
+            raise HTTPException(status_code=400, detail="All files must be videos")
+        
+        form_analysis_batch = await services.get("form_analysis_batch")
+        spooled = await form_analysis_batch.spool(list(zip(videos, exercise_names)))
+    except HTTPException:
+        raise
+    except (BatchTooLarge, VideoTooLarge) as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to analyze form batch: {str(e)}")
+    
+    async def stream_results():
+        async for item in form_analysis_batch.analyze(spooled, options):
+            yield json.dumps(item) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/analyze-form/jobs", response_model=FormAnalysisJob, status_code=202)
+async def submit_form_analysis_job(
+    video: UploadFile = File(...),
+    exercise_name: str = None,
+    options: FormAnalysisOptions = Depends(form_analysis_options)
+):
+    """Start a background form analysis and return its job id immediately"""
+    try:
+        if not video.content_type.startswith('video/'):
+            raise HTTPException(status_code=400, detail="File must be a video")
+        
+        form_analysis_jobs = await services.get("form_analysis_jobs")
+        return await form_analysis_jobs.submit(video, exercise_name, options)
+    except HTTPException:
+        raise
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except VideoTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to submit form analysis: {str(e)}")
+
+@app.get("/analyze-form/jobs/{job_id}", response_model=FormAnalysisJob)
+async def get_form_analysis_job(job_id: str):
+    """Report a form analysis job's status and progress"""
+    form_analysis_jobs = await services.get("form_analysis_jobs")
+    job = await form_analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/analyze-form/jobs/{job_id}/result", response_model=FormAnalysisResponse)
+async def get_form_analysis_job_result(job_id: str):
+    """Return the analysis of a completed form analysis job"""
+    form_analysis_jobs = await services.get("form_analysis_jobs")
+    job = await form_analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Failed to analyze form: {job['error']}")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job["result"]
+
+@app.websocket("/ws/form-analysis")
+async def live_form_analysis(
+    websocket: WebSocket,
+    exercise_name: str,
+    tier: Optional[Literal["fast", "balanced", "accurate"]] = None
+):
+    """Real-time form analysis over a WebSocket.
+
+    Binary messages are encoded camera frames; text messages are JSON with
+    client-side ``landmarks`` and an optional ``timestamp``, or ``{"type": "end"}``
+    to finish. Every frame gets a ``frame`` message with checkpoint scores and
+    a ``rep`` message follows each completed repetition.
+    """
+    await websocket.accept()
+    if len(live_form_sessions) >= MAX_LIVE_SESSIONS:
+        await websocket.close(code=1013, reason="Too many live analysis sessions")
+        return
+
+    try:
+        form_analyzer = await services.get("form_analyzer")
+    except Exception:
+        await websocket.close(code=1011, reason="Form analysis is unavailable")
+        return
+
+    from services.live_analysis import LiveFormSession
+    session = LiveFormSession(form_analyzer, exercise_name, tier)
+    live_form_sessions.add(session)
+    loop = asyncio.get_running_loop()
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            try:
+                if message.get("bytes") is not None:
+                    # Frames are handled one at a time, in arrival order, off the event loop
+                    replies = await loop.run_in_executor(None, session.process_image, message["bytes"])
+                else:
+                    payload = json.loads(message.get("text") or "{}")
+                    if not isinstance(payload, dict):
+                        raise ValueError("Messages must be JSON objects")
+                    if payload.get("type") == "end":
+                        await websocket.send_json(session.summary())
+                        await websocket.close()
+                        break
+                    replies = session.process_landmarks(payload["landmarks"], payload.get("timestamp"))
+            except (ValueError, KeyError, TypeError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+
+            for reply in replies:
+                await websocket.send_json(reply)
+
+    except WebSocketDisconnect:
+        pass
+
+    finally:
+        live_form_sessions.discard(session)
+        session.close()
+
 @app.post("/analyze-nutrition", response_model=NutritionResponse)
 async def analyze_nutrition(request: NutritionRequest):
     """Analyze nutrition from food photos and provide recommendations"""
     try:
+        nutrition_analyzer = await services.get("nutrition_analyzer")
         analysis = await nutrition_analyzer.analyze_nutrition(
             food_image=request.food_image,
             user_goals=request.user_goals,
@@ -112,6 +504,7 @@ async def analyze_nutrition(request: NutritionRequest):
 async def predict_progress(request: Dict[str, Any]):
     """Predict user progress based on workout history and goals"""
     try:
+        progress_predictor = await services.get("progress_predictor")
         prediction = await progress_predictor.predict_progress(
             user_stats=request.get("user_stats"),
             user_goals=request.get("user_goals"),
@@ -125,6 +518,7 @@ async def predict_progress(request: Dict[str, Any]):
 async def generate_coaching_feedback(request: Dict[str, Any]):
     """Generate AI coaching feedback based on workout performance"""
     try:
+        coaching_ai = await services.get("coaching_ai")
         feedback = await coaching_ai.generate_feedback(
             workout=request.get("workout"),
             performance=request.get("performance"),
@@ -139,6 +533,7 @@ async def generate_coaching_feedback(request: Dict[str, Any]):
 async def generate_voice_coaching(request: Dict[str, Any]):
     """Generate real-time voice coaching instructions"""
     try:
+        coaching_ai = await services.get("coaching_ai")
         coaching = await coaching_ai.generate_voice_coaching(
             exercise=request.get("exercise"),
             current_set=request.get("current_set"),
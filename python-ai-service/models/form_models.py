@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Literal
 
 class FormFeedback(BaseModel):
     checkpoint: str
@@ -17,6 +17,23 @@ class QualityMetrics(BaseModel):
     smoothness: float
     overall_quality: float
 
+class RepAnalysis(BaseModel):
+    rep: int
+    start_time: float
+    end_time: float
+    duration: float
+    eccentric_duration: float
+    concentric_duration: float
+    range_of_motion: float
+    score: float
+    form_scores: Dict[str, float]
+
+class FormAnalysisOptions(BaseModel):
+    sampling: Optional[Literal["full", "fixed", "adaptive"]] = None
+    target_fps: Optional[float] = None
+    max_long_edge: Optional[int] = None
+    tier: Optional[Literal["fast", "balanced", "accurate"]] = None
+
 class FormAnalysisResponse(BaseModel):
     overall_score: float
     feedback: List[FormFeedback]
@@ -24,4 +41,19 @@ class FormAnalysisResponse(BaseModel):
     risk_level: str
     rep_count: int
     timing_analysis: TimingAnalysis
-    form_breakdown: Dict[str, float]
\ No newline at end of file
+    form_breakdown: Dict[str, float]
+    reps: Optional[List[RepAnalysis]] = None
+    analysis_fps: Optional[float] = None
+    sampling_mode: Optional[str] = None
+    tier: Optional[str] = None
+
+class FormAnalysisJobProgress(BaseModel):
+    frames_processed: Optional[int] = None
+    total_frames: Optional[int] = None
+    rep_count: int = 0
+
+class FormAnalysisJob(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "completed", "failed"]
+    progress: FormAnalysisJobProgress
+    error: Optional[str] = None
\ No newline at end of file
@@ -1,3 +1,4 @@
+from datetime import date
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 
@@ -14,6 +15,23 @@ class WorkoutRequest(BaseModel):
     difficulty: str = "intermediate"
     equipment: List[str] = []
     user_history: List[Dict[str, Any]] = []
+    # With a user id, the stored training state replaces user_history once seeded
+    user_id: Optional[str] = None
+    # Same seed and inputs, same workout; omitted, a random seed is used and returned
+    seed: Optional[int] = None
+
+class WorkoutProgramRequest(WorkoutRequest):
+    days: int = 28
+    # Defaults to tomorrow
+    start_date: Optional[date] = None
+    # Weekdays without a session, 0 is Monday
+    rest_weekdays: List[int] = []
+
+class BulkWorkoutRequest(BaseModel):
+    # Either independent workouts, e.g. every subscriber's next session...
+    requests: List[WorkoutRequest] = []
+    # ...or consecutive days for a single user
+    program: Optional[WorkoutProgramRequest] = None
 
 class ExerciseSet(BaseModel):
     type: str
@@ -45,4 +63,5 @@ class WorkoutResponse(BaseModel):
     target_muscles: List[str]
     equipment: List[str]
     coaching_notes: str
-    workout_structure: str
\ No newline at end of file
+    workout_structure: str
+    seed: Optional[int] = None
\ No newline at end of file
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - redis is optional at runtime
+    aioredis = None
+
+from services.analysis_pool import AnalysisPoolFull
+from services.video_upload import spool_upload
+
+JOB_TTL = int(os.getenv("FORM_ANALYSIS_JOB_TTL", 3600))
+MAX_PENDING_JOBS = int(os.getenv("FORM_ANALYSIS_MAX_JOBS", 100))
+PROGRESS_INTERVAL = 1.0
+
+
+class JobQueueFull(Exception):
+    """Raised when too many analysis jobs are already pending"""
+
+
+class ProgressReporter:
+    """Picklable progress callback that pool workers use to publish job progress"""
+
+    def __init__(self, progress_map, job_id: str):
+        self.progress_map = progress_map
+        self.job_id = job_id
+
+    def __call__(self, frames_processed: int, total_frames: int, rep_count: int):
+        self.progress_map[self.job_id] = {
+            "frames_processed": frames_processed,
+            "total_frames": total_frames,
+            "rep_count": rep_count
+        }
+
+
+class InMemoryJobStore:
+    """Job status records kept in this process; finished jobs expire after ``ttl`` seconds"""
+
+    def __init__(self, ttl: int = JOB_TTL):
+        self.ttl = ttl
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    def _expire(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.get("finished_at") and now - job["finished_at"] > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def save(self, job: Dict[str, Any]):
+        self._expire()
+        self._jobs[job["job_id"]] = job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+
+class RedisJobStore:
+    """Job status records in Redis so any replica can answer status and result polls.
+
+    Only status, progress and results are shared: the job itself still runs
+    in the process that accepted it (see FormAnalysisJobs).
+    """
+
+    def __init__(self, redis_url: str, ttl: int = JOB_TTL):
+        if aioredis is None:
+            raise RuntimeError("redis package is required for the redis job backend")
+        self.ttl = ttl
+        self._redis = aioredis.from_url(redis_url)
+
+    async def save(self, job: Dict[str, Any]):
+        await self._redis.set(f"form:job:{job['job_id']}", json.dumps(job), ex=self.ttl)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = await self._redis.get(f"form:job:{job_id}")
+        return json.loads(data) if data is not None else None
+
+
+def create_job_store():
+    """Pick the job status store from FORM_ANALYSIS_JOB_BACKEND (memory or redis).
+
+    The memory store is per process: with more than one replica or worker,
+    polls landing elsewhere find no job, so those deployments need redis.
+    """
+    backend = os.getenv("FORM_ANALYSIS_JOB_BACKEND", "memory")
+    if backend == "redis":
+        return RedisJobStore(os.getenv("FORM_ANALYSIS_JOB_REDIS_URL", os.getenv("REDIS_URL")))
+    if backend == "memory":
+        return InMemoryJobStore()
+    raise ValueError(f"Unknown form analysis job backend: {backend}")
+
+
+def _frame_count(video_path: str) -> Optional[int]:
+    """Frame count from the container, or None if the video cannot be opened"""
+    from services.video_decoders import create_decoder
+
+    try:
+        with create_decoder(video_path) as decoder:
+            return int(decoder.frame_count)
+    except Exception:
+        return None
+
+
+class FormAnalysisJobs:
+    """Run form analyses as background jobs with pollable progress.
+
+    Jobs run as asyncio tasks in the process that accepted them, feeding
+    that process's analysis pool; the store only records their status. A
+    restart therefore loses queued and running jobs, and other workers
+    never pick them up, but with the Redis store any replica can answer
+    polls for a job. Jobs wait for a free pool worker rather than failing
+    when the pool is busy.
+    """
+
+    def __init__(self, form_analyzer, store=None, max_pending: int = MAX_PENDING_JOBS):
+        self.form_analyzer = form_analyzer
+        self.store = store or create_job_store()
+        self.max_pending = max_pending
+        self._tasks = set()
+        self._manager = None
+        self._slots = None
+
+        # Pool workers write progress into a shared dict. Starting its manager
+        # process takes a while, so it happens here, while the service is
+        # built off the event loop, not inside the first job request
+        if self.form_analyzer.pool is not None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+            self._progress = self._manager.dict()
+        else:
+            self._progress = {}
+
+    def _job_slots(self) -> asyncio.Semaphore:
+        """Jobs wait for a free worker instead of being rejected by the pool"""
+        if self._slots is None:
+            pool = self.form_analyzer.pool
+            self._slots = asyncio.Semaphore(pool.max_workers if pool is not None else 1)
+        return self._slots
+
+    async def submit(self, video, exercise_name: str, options) -> Dict[str, Any]:
+        if len(self._tasks) >= self.max_pending:
+            raise JobQueueFull(f"Too many pending form analysis jobs (max {self.max_pending})")
+
+        temp_path, content_hash = await spool_upload(video)
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "exercise_name": exercise_name,
+            "submitted_at": time.time(),
+            "progress": {"frames_processed": 0, "total_frames": None, "rep_count": 0}
+        }
+        await self.store.save(job)
+
+        task = asyncio.create_task(self._run(job, temp_path, content_hash, options))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _analyze(self, job: Dict[str, Any], temp_path: str, content_hash: str, options):
+        """Run the analysis, publishing worker progress while it runs"""
+        reporter = ProgressReporter(self._progress, job["job_id"])
+        analysis = asyncio.ensure_future(self.form_analyzer.analyze_file(
+            temp_path, content_hash, job["exercise_name"], options, progress=reporter
+        ))
+        while not analysis.done():
+            await asyncio.wait([analysis], timeout=PROGRESS_INTERVAL)
+            if job["job_id"] in self._progress:
+                job["progress"] = dict(self._progress[job["job_id"]])
+                await self.store.save(job)
+        return analysis.result()
+
+    async def _run(self, job: Dict[str, Any], temp_path: str, content_hash: str, options):
+        try:
+            async with self._job_slots():
+                while True:
+                    job["status"] = "running"
+                    job["started_at"] = time.time()
+                    await self.store.save(job)
+                    try:
+                        job["result"] = await self._analyze(job, temp_path, content_hash, options)
+                        break
+                    except AnalysisPoolFull as e:
+                        # Other requests hold the pool; stay queued instead of failing
+                        job["status"] = "queued"
+                        await self.store.save(job)
+                        await asyncio.sleep(min(e.retry_after, 5))
+
+                # Cached results arrive without worker progress reports
+                if job["progress"]["total_frames"] is None:
+                    loop = asyncio.get_running_loop()
+                    job["progress"]["total_frames"] = await loop.run_in_executor(
+                        None, _frame_count, temp_path
+                    )
+                job["progress"]["rep_count"] = job["result"]["rep_count"]
+                job["progress"]["frames_processed"] = job["progress"]["total_frames"]
+                job["status"] = "completed"
+
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+
+        finally:
+            job["finished_at"] = time.time()
+            self._progress.pop(job["job_id"], None)
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+        await self.store.save(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(job_id)
+
+    def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
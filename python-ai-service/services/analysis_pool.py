@@ -0,0 +1,186 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional
+
+# Per-process analyzer; each pool worker owns one MediaPipe Pose instance per tier
+_worker_analyzer = None
+
+
+def _init_worker():
+    """Create the worker-local FormAnalyzer (and its Pose models) once per process"""
+    global _worker_analyzer
+    from services.form_analyzer import FormAnalyzer
+
+    preload = os.getenv("FORM_ANALYSIS_PRELOAD_TIERS", "")
+    _worker_analyzer = FormAnalyzer(
+        preload_tiers=[tier.strip() for tier in preload.split(",") if tier.strip()]
+    )
+
+
+def _analyze_video(
+    video_path: str, exercise_name: str, options=None, include_track: bool = False, progress=None
+) -> Dict[str, Any]:
+    """Run the CPU-bound video analysis inside a pool worker"""
+    return _worker_analyzer.analyze_video(
+        video_path, exercise_name, options, include_track, progress
+    )
+
+
+class AnalysisPoolFull(Exception):
+    """Raised when the admission queue cannot accept another analysis"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Form analysis queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AnalysisWorkerCrashed(Exception):
+    """Raised when a pool worker dies twice while running the same analysis"""
+
+    def __init__(self):
+        super().__init__("Form analysis worker crashed while analyzing this video")
+
+
+class AnalysisPool:
+    """Bounded process pool for form analysis with a fail-fast admission queue.
+
+    A worker that dies (e.g. a native crash in the decoder or MediaPipe)
+    breaks the whole executor and fails every analysis running on it. The
+    broken executor is replaced once and each of those analyses is run
+    again. One that crashes the fresh pool too is run alone in a private
+    worker, so only the analysis that actually crashes it fails.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        default_retry_after: Optional[int] = None
+    ):
+        self.max_workers = max_workers or int(
+            os.getenv("FORM_ANALYSIS_WORKERS", os.cpu_count() or 1)
+        )
+        self.max_queue = max_queue if max_queue is not None else int(
+            os.getenv("FORM_ANALYSIS_QUEUE_SIZE", self.max_workers * 2)
+        )
+        self.default_retry_after = default_retry_after or int(
+            os.getenv("FORM_ANALYSIS_RETRY_AFTER", 5)
+        )
+        self._executor = None
+        self._in_flight = 0
+        self._avg_duration = None
+        self._completed = 0
+        self._rejected = 0
+        self._crashes = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def _new_executor(self, max_workers: int) -> ProcessPoolExecutor:
+        # Spawn rather than fork so workers never inherit native MediaPipe/OpenCV state
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start worker processes on first use"""
+        if self._executor is None:
+            self._executor = self._new_executor(self.max_workers)
+        return self._executor
+
+    def _replace_broken(self, executor: ProcessPoolExecutor):
+        """Drop a broken executor; jobs that hit it together replace it only once"""
+        if self._executor is executor:
+            self._crashes += 1
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _retry_after(self) -> int:
+        """Estimate seconds until a queue slot frees up"""
+        if self._avg_duration is None:
+            return self.default_retry_after
+
+        waiting_rounds = (self._in_flight - self.max_workers + 1) / self.max_workers
+        return max(1, math.ceil(self._avg_duration * max(1, waiting_rounds)))
+
+    async def analyze_video(
+        self,
+        video_path: str,
+        exercise_name: str,
+        options=None,
+        include_track: bool = False,
+        progress=None
+    ) -> Dict[str, Any]:
+        """Run a form analysis on the pool, rejecting it if the queue is full.
+
+        ``progress`` must be picklable; it is called from the worker process.
+        """
+        if self._in_flight >= self.capacity:
+            self._rejected += 1
+            raise AnalysisPoolFull(self._retry_after())
+
+        self._in_flight += 1
+        started = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            for _ in range(2):
+                executor = self._get_executor()
+                try:
+                    return await loop.run_in_executor(
+                        executor, _analyze_video,
+                        video_path, exercise_name, options, include_track, progress
+                    )
+                except BrokenProcessPool:
+                    self._replace_broken(executor)
+            # Two crashes, but possibly caused by another analysis on the
+            # same pool: only one that crashes a worker of its own fails
+            return await self._analyze_isolated(
+                video_path, exercise_name, options, include_track, progress
+            )
+        finally:
+            self._in_flight -= 1
+            self._record_duration(time.monotonic() - started)
+
+    async def _analyze_isolated(self, *args) -> Dict[str, Any]:
+        """Run one analysis in a private single-worker pool"""
+        executor = self._new_executor(1)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, _analyze_video, *args)
+        except BrokenProcessPool:
+            self._crashes += 1
+            raise AnalysisWorkerCrashed()
+        finally:
+            executor.shutdown(wait=False)
+
+    def _record_duration(self, duration: float):
+        """Track an exponentially weighted average of analysis time"""
+        self._completed += 1
+        if self._avg_duration is None:
+            self._avg_duration = duration
+        else:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "queue_size": self.max_queue,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "worker_crashes": self._crashes,
+            "average_duration": round(self._avg_duration, 2) if self._avg_duration else None
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,146 @@
+import asyncio
+import os
+from collections import Counter, defaultdict
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from services.analysis_pool import AnalysisPoolFull
+from services.video_upload import MAX_UPLOAD_BYTES, spool_upload
+
+MAX_BATCH_CLIPS = int(os.getenv("FORM_ANALYSIS_MAX_BATCH", 20))
+# Whole multipart body, capped while it arrives; defaults to every clip at the single-upload limit
+MAX_BATCH_BYTES = int(
+    os.getenv("FORM_ANALYSIS_MAX_BATCH_MB", MAX_BATCH_CLIPS * MAX_UPLOAD_BYTES // (1024 * 1024))
+) * 1024 * 1024
+RISK_ORDER = {"low": 0, "medium": 1, "high": 2}
+
+
+class BatchTooLarge(Exception):
+    """Raised when a batch has more clips than FORM_ANALYSIS_MAX_BATCH"""
+
+
+class FormAnalysisBatch:
+    """Analyze a session's clips together, yielding each result as it finishes.
+
+    All clips are spooled to disk first, then analyzed concurrently with at
+    most one clip per pool worker in flight, so a batch queues behind its own
+    clips instead of being rejected by the pool. The last item yielded is a
+    summary of the whole session.
+    """
+
+    def __init__(self, form_analyzer, max_clips: int = MAX_BATCH_CLIPS):
+        self.form_analyzer = form_analyzer
+        self.max_clips = max_clips
+        self._slots = None
+
+    def _clip_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            pool = self.form_analyzer.pool
+            self._slots = asyncio.Semaphore(pool.max_workers if pool is not None else 1)
+        return self._slots
+
+    async def spool(self, clips: List[Tuple[Any, str]]) -> List[Dict[str, Any]]:
+        """Write every upload to a temp file before analysis starts"""
+        if not clips:
+            raise ValueError("No clips in batch")
+        if len(clips) > self.max_clips:
+            raise BatchTooLarge(f"Batch has {len(clips)} clips (max {self.max_clips})")
+
+        spooled = []
+        try:
+            for index, (video, exercise_name) in enumerate(clips):
+                temp_path, content_hash = await spool_upload(video)
+                spooled.append({
+                    "index": index,
+                    "filename": video.filename,
+                    "exercise_name": exercise_name,
+                    "path": temp_path,
+                    "content_hash": content_hash
+                })
+        except BaseException:
+            self.cleanup(spooled)
+            raise
+
+        return spooled
+
+    async def _analyze_clip(self, clip: Dict[str, Any], options) -> Dict[str, Any]:
+        item = {
+            "type": "clip",
+            "index": clip["index"],
+            "filename": clip["filename"],
+            "exercise_name": clip["exercise_name"]
+        }
+
+        try:
+            async with self._clip_slots():
+                while True:
+                    try:
+                        item["result"] = await self.form_analyzer.analyze_file(
+                            clip["path"], clip["content_hash"], clip["exercise_name"], options
+                        )
+                        break
+                    except AnalysisPoolFull as e:
+                        # Other requests hold the pool; wait instead of failing the clip
+                        await asyncio.sleep(min(e.retry_after, 5))
+        except Exception as e:
+            item["error"] = str(e)
+
+        return item
+
+    async def analyze(self, spooled: List[Dict[str, Any]], options) -> AsyncIterator[Dict[str, Any]]:
+        """Yield clip results in completion order, then the session summary"""
+        tasks = [asyncio.create_task(self._analyze_clip(clip, options)) for clip in spooled]
+        completed = []
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                completed.append(item)
+                yield item
+
+            yield self._summarize(completed)
+
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.cleanup(spooled)
+
+    def cleanup(self, spooled: List[Dict[str, Any]]):
+        for clip in spooled:
+            if os.path.exists(clip["path"]):
+                os.unlink(clip["path"])
+
+    def _summarize(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Session totals across every successfully analyzed clip"""
+        results = [item for item in items if "result" in item]
+        by_exercise = defaultdict(list)
+        for item in results:
+            by_exercise[item["exercise_name"]].append(item["result"])
+
+        improvements = Counter(
+            improvement for item in results for improvement in item["result"]["improvements"]
+        )
+
+        return {
+            "type": "summary",
+            "clips": len(items),
+            "analyzed": len(results),
+            "failed": len(items) - len(results),
+            "total_reps": sum(item["result"]["rep_count"] for item in results),
+            "average_score": round(
+                sum(item["result"]["overall_score"] for item in results) / len(results), 1
+            ) if results else None,
+            "highest_risk": max(
+                (item["result"]["risk_level"] for item in results), key=RISK_ORDER.get, default=None
+            ),
+            "exercises": {
+                exercise_name: {
+                    "clips": len(exercise_results),
+                    "total_reps": sum(result["rep_count"] for result in exercise_results),
+                    "average_score": round(
+                        sum(result["overall_score"] for result in exercise_results) / len(exercise_results), 1
+                    )
+                }
+                for exercise_name, exercise_results in by_exercise.items()
+            },
+            "top_improvements": [improvement for improvement, _ in improvements.most_common(3)]
+        }
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional
+
+from services.exercise_index import ExerciseIndex
+
+DEFAULT_CATALOG_PATH = os.getenv(
+    "EXERCISE_CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "exercises.json")
+)
+CATALOG_CACHE_DIR = os.getenv("EXERCISE_CATALOG_CACHE_DIR", tempfile.gettempdir())
+# Seconds between checks of the source file for changes; 0 disables hot reload
+RELOAD_INTERVAL = float(os.getenv("EXERCISE_CATALOG_RELOAD_INTERVAL", 5))
+
+MAGIC = b"EXCATv1\n"
+# Fields selection reads for every candidate; the rest stay in the mapped file
+SUMMARY_FIELDS = ("name", "category", "target_muscles", "difficulty", "equipment", "calories_per_minute")
+
+
+def _source_signature(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def compile_catalog(source_path: str, compiled_path: str):
+    """Convert a JSON catalog into the compact memory-mappable format.
+
+    Layout: magic, a length-prefixed JSON header holding exercise ids,
+    summary fields and the source file signature, a table of record
+    offsets, then every full record as JSON bytes back to back. The file
+    is written to a temp name and renamed, so workers compiling at the same
+    time never see a partial file.
+    """
+    signature = _source_signature(source_path)
+    with open(source_path) as f:
+        source = json.load(f)
+
+    # Accept {id: exercise} or [{"id": ..., ...}]
+    if isinstance(source, list):
+        source = {exercise["id"]: exercise for exercise in source}
+
+    ids = list(source)
+    summaries = [{field: source[i][field] for field in SUMMARY_FIELDS if field in source[i]} for i in ids]
+    records = [json.dumps(source[i], separators=(",", ":")).encode() for i in ids]
+
+    header = json.dumps({"source": signature, "ids": ids, "summaries": summaries}).encode()
+    offsets = [0]
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+
+    directory = os.path.dirname(compiled_path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".exercise-catalog-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+            for record in records:
+                f.write(record)
+        os.replace(temp_path, compiled_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class CatalogExercise(Mapping):
+    """Read-only exercise record backed by the mapped catalog file.
+
+    Summary fields are held in memory; any other field decodes the full
+    record from the shared mapping on access, so instructions, tips and
+    checkpoints cost no per-worker memory until an exercise is returned.
+    ``copy()`` decodes it once into a plain, mutable dict.
+    """
+
+    __slots__ = ("_summary", "_buffer", "_start", "_end")
+
+    def __init__(self, summary: Dict[str, Any], buffer, start: int, end: int):
+        self._summary = summary
+        self._buffer = buffer
+        self._start = start
+        self._end = end
+
+    def _record(self) -> Dict[str, Any]:
+        return json.loads(self._buffer[self._start:self._end])
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._summary:
+            return self._summary[key]
+        return self._record()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._record())
+
+    def __len__(self) -> int:
+        return len(self._record())
+
+    def copy(self) -> Dict[str, Any]:
+        return self._record()
+
+
+class ExerciseCatalog:
+    """Exercise catalog loaded from a data file and shared between workers.
+
+    The JSON source is compiled once into a compact file that every worker
+    maps read-only, so the page cache holds a single copy of the records
+    however many uvicorn workers run. Indexes are built at load time. With
+    hot reload on, ``refresh`` picks up edits to the source file and swaps
+    in a new ``index``; request handlers call ``refresh_in_background`` so
+    the check and recompile never run on the event loop, and keep using
+    the ``index`` they started with.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        reload_interval: float = RELOAD_INTERVAL
+    ):
+        self.path = os.path.abspath(path or DEFAULT_CATALOG_PATH)
+        cache_key = hashlib.sha1(self.path.encode()).hexdigest()[:12]
+        self.compiled_path = os.path.join(cache_dir or CATALOG_CACHE_DIR, f"exercise-catalog-{cache_key}.bin")
+        self.reload_interval = reload_interval
+
+        self.exercises: Dict[str, CatalogExercise] = {}
+        self.index: ExerciseIndex = None
+        self.loaded_at = None
+        self.reloads = 0
+        self._signature = None
+        self._checked_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+        self._load()
+
+    def _open_compiled(self, signature: List[int]):
+        """Map the compiled file, returning its header and the mapping, or None if stale"""
+        if not os.path.exists(self.compiled_path):
+            return None
+
+        with open(self.compiled_path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if mapping[:len(MAGIC)] != MAGIC:
+            mapping.close()
+            return None
+
+        header_start = len(MAGIC) + 8
+        (header_length,) = struct.unpack_from("<Q", mapping, len(MAGIC))
+        header = json.loads(mapping[header_start:header_start + header_length])
+        if header["source"] != signature:
+            mapping.close()
+            return None
+
+        header["offsets_start"] = header_start + header_length
+        return header, mapping
+
+    def _load(self):
+        signature = _source_signature(self.path)
+        opened = self._open_compiled(signature)
+        if opened is None:
+            compile_catalog(self.path, self.compiled_path)
+            opened = self._open_compiled(signature)
+            if opened is None:
+                raise RuntimeError(f"Exercise catalog changed while compiling: {self.path}")
+
+        header, mapping = opened
+        count = len(header["ids"])
+        offsets = struct.unpack_from(f"<{count + 1}Q", mapping, header["offsets_start"])
+        records_start = header["offsets_start"] + 8 * (count + 1)
+
+        exercises = {
+            exercise_id: CatalogExercise(
+                summary, mapping, records_start + offsets[i], records_start + offsets[i + 1]
+            )
+            for i, (exercise_id, summary) in enumerate(zip(header["ids"], header["summaries"]))
+        }
+
+        # Swap in the new catalog in one step; records of the old one keep
+        # their own mapping alive until nothing references them
+        self.exercises, self.index = exercises, ExerciseIndex(exercises)
+        self._signature = signature
+        self.loaded_at = time.time()
+
+    @property
+    def version(self) -> str:
+        """Identifies the loaded source file; changes on every reload"""
+        return "-".join(str(part) for part in self._signature)
+
+    def _refresh_due(self) -> bool:
+        return self.reload_interval > 0 and time.monotonic() - self._checked_at >= self.reload_interval
+
+    def refresh(self) -> bool:
+        """Reload if the source file changed; checks at most once per reload_interval"""
+        if not self._refresh_due():
+            return False
+        # Another thread is already checking
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+
+        try:
+            if not self._refresh_due():
+                return False
+            self._checked_at = time.monotonic()
+
+            if _source_signature(self.path) == self._signature:
+                return False
+            self._load()
+        except Exception as e:
+            # Keep serving the last good catalog if the new file is broken
+            print(f"Error reloading exercise catalog: {e}")
+            return False
+        finally:
+            self._refresh_lock.release()
+
+        self.reloads += 1
+        return True
+
+    def refresh_in_background(self) -> bool:
+        """Start ``refresh`` on a daemon thread if a check is due; never blocks.
+
+        Returns whether a check was started. Requests keep reading the
+        current ``index`` until the reload swaps in the new one.
+        """
+        if not self._refresh_due() or self._refresh_lock.locked():
+            return False
+        threading.Thread(target=self.refresh, name="exercise-catalog-refresh", daemon=True).start()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exercises": len(self.exercises),
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads
+        }
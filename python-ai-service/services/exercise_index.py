@@ -0,0 +1,122 @@
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+DIFFICULTY_LEVELS = {
+    'beginner': ['beginner'],
+    'intermediate': ['beginner', 'intermediate'],
+    'advanced': ['beginner', 'intermediate', 'advanced']
+}
+# Exercises burning more than this per minute count as cardio candidates
+HIGH_CALORIE_PER_MINUTE = 7
+
+
+class ExerciseIndex:
+    """Lookup tables over an exercise database, built once at load time.
+
+    Sets of exercises are Python ints used as bitsets, with bit ``i``
+    standing for the ``i``-th exercise in database order, so filtering is
+    a few ``&``/``|`` operations regardless of catalog size. Required
+    equipment is a bitmask per exercise, and exercises are grouped by
+    mask so an equipment check touches each distinct combination once.
+    Dense arrays in the same order (muscles worked, category codes,
+    calorie rates) let workout planning score every candidate at once.
+    """
+
+    def __init__(self, exercise_database: Dict[str, Dict[str, Any]]):
+        self.ids: List[str] = list(exercise_database)
+        self.exercises: List[Dict[str, Any]] = list(exercise_database.values())
+        self.positions = {exercise_id: i for i, exercise_id in enumerate(self.ids)}
+
+        self.all = (1 << len(self.exercises)) - 1
+        self._bitset_bytes = max(1, (len(self.exercises) + 7) // 8)
+        self.by_difficulty: Dict[str, int] = {}
+        self.by_category: Dict[str, int] = {}
+        self.by_muscle: Dict[str, int] = {}
+        self.by_name: Dict[str, int] = {}
+        self.by_equipment_mask: Dict[int, int] = {}
+        self.equipment_bits: Dict[str, int] = {}
+        self.compound = 0
+        self.isolation = 0
+        self.high_calorie = 0
+
+        for i, exercise in enumerate(self.exercises):
+            bit = 1 << i
+            self._add(self.by_difficulty, exercise['difficulty'], bit)
+            self._add(self.by_category, exercise['category'], bit)
+            self._add(self.by_name, exercise['name'], bit)
+            for muscle in exercise['target_muscles']:
+                self._add(self.by_muscle, muscle, bit)
+
+            mask = 0
+            for item in exercise.get('equipment', []):
+                if item not in self.equipment_bits:
+                    self.equipment_bits[item] = 1 << len(self.equipment_bits)
+                mask |= self.equipment_bits[item]
+            self._add(self.by_equipment_mask, mask, bit)
+
+            # Compound exercises work two or more target muscles
+            if len(exercise['target_muscles']) >= 2:
+                self.compound |= bit
+            else:
+                self.isolation |= bit
+
+            if exercise.get('calories_per_minute', 0) > HIGH_CALORIE_PER_MINUTE:
+                self.high_calorie |= bit
+
+        self.muscles: List[str] = list(self.by_muscle)
+        self.muscle_ids = {muscle: i for i, muscle in enumerate(self.muscles)}
+        self.muscle_matrix = np.zeros((len(self.exercises), len(self.muscles)))
+        for i, exercise in enumerate(self.exercises):
+            for muscle in exercise['target_muscles']:
+                self.muscle_matrix[i, self.muscle_ids[muscle]] = 1.0
+
+        self.categories: List[str] = list(self.by_category)
+        category_ids = {category: i for i, category in enumerate(self.categories)}
+        self.category_codes = np.array(
+            [category_ids[exercise['category']] for exercise in self.exercises], dtype=np.int64
+        )
+        self.calories_per_minute = np.array(
+            [exercise.get('calories_per_minute', 6) for exercise in self.exercises], dtype=np.float64
+        )
+
+    @staticmethod
+    def _add(index: Dict[Any, int], key: Any, bit: int):
+        index[key] = index.get(key, 0) | bit
+
+    def equipment_mask(self, equipment: Iterable[str]) -> int:
+        """Bitmask of the given equipment; items no exercise needs are ignored"""
+        mask = 0
+        for item in equipment:
+            mask |= self.equipment_bits.get(item, 0)
+        return mask
+
+    def available(self, equipment: Iterable[str], difficulty: str) -> int:
+        """Exercises doable with the equipment at or below the difficulty"""
+        allowed = 0
+        for level in DIFFICULTY_LEVELS.get(difficulty, ['beginner']):
+            allowed |= self.by_difficulty.get(level, 0)
+
+        owned = self.equipment_mask(equipment)
+        doable = 0
+        for mask, exercises in self.by_equipment_mask.items():
+            if not mask & ~owned:
+                doable |= exercises
+
+        return allowed & doable
+
+    def flags(self, exercises: int) -> np.ndarray:
+        """0/1 per exercise in database order, 1 where the bitset has it"""
+        # Unpack the bitset in C rather than peeling bits off one at a time
+        packed = np.frombuffer(exercises.to_bytes(self._bitset_bytes, 'little'), dtype=np.uint8)
+        return np.unpackbits(packed, bitorder='little', count=len(self.exercises)).astype(np.float64)
+
+    def positions_in(self, exercises: int) -> List[int]:
+        """Database positions of the exercises in a bitset, in order"""
+        if not exercises:
+            return []
+        return np.flatnonzero(self.flags(exercises)).tolist()
+
+    def select(self, exercises: int) -> List[Dict[str, Any]]:
+        """Exercise records of a bitset, in database order"""
+        return [self.exercises[i] for i in self.positions_in(exercises)]
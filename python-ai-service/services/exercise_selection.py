@@ -0,0 +1,156 @@
+import os
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from services.exercise_index import ExerciseIndex
+
+# Search stops after this long and the best plan so far is finished greedily
+SELECTION_TIME_LIMIT_MS = float(os.getenv("WORKOUT_SELECTION_TIME_LIMIT_MS", 25))
+BEAM_WIDTH = int(os.getenv("WORKOUT_SELECTION_BEAM_WIDTH", 8))
+# Best next exercises tried per plan at each step
+BRANCHING = 6
+# Most promising exercises the search considers, whatever the catalog size
+CANDIDATE_POOL = 96
+
+SETS_BY_DIFFICULTY = {'beginner': 2, 'intermediate': 3, 'advanced': 4}
+WORK_SECONDS_PER_SET = 40
+CORE_REST_SECONDS = 60
+DEFAULT_REST_SECONDS = 90
+
+# Value of working a muscle, and of using a category, for the first,
+# second and any further time in one workout
+COVERAGE_GAIN = np.array([1.0, 0.4, -0.8])
+CATEGORY_GAIN = np.array([0.5, 0.0, -0.5])
+FATIGUE_PENALTY = 1.5
+PREFERENCE_BONUS = 0.75
+# Seeded noise so equally good plans rotate between workouts
+VARIETY = 0.3
+
+
+def rest_seconds(category: str) -> int:
+    return CORE_REST_SECONDS if category == 'core' else DEFAULT_REST_SECONDS
+
+
+def plan_exercises(
+    index: ExerciseIndex,
+    candidates: int,
+    count: int,
+    minutes: float,
+    difficulty: str,
+    muscle_fatigue: Dict[str, float],
+    preferred: List[str],
+    bonus: np.ndarray,
+    rng: random.Random,
+    time_limit_ms: float = SELECTION_TIME_LIMIT_MS
+) -> List[int]:
+    """Choose up to ``count`` exercises from a bitset that fit in ``minutes``.
+
+    A plan's score sums, per exercise, its ``bonus`` (one value per catalog
+    position, set by the workout type), a bonus for preferred exercises, a
+    penalty for the average fatigue of its muscles and a little seeded
+    noise, plus the value of the muscles and category it adds to the plan,
+    which shrinks and turns negative as they repeat. Plans with more
+    exercises win; among equally long plans the higher score wins.
+
+    Only the ``CANDIDATE_POOL`` exercises with the best possible
+    contribution are searched. Beam search keeps the ``BEAM_WIDTH`` best
+    partial plans and extends each with its ``BRANCHING`` best next
+    exercises, scoring every candidate for every plan in one matrix
+    product. Past ``time_limit_ms`` the best plan is finished greedily, so
+    the cost stays bounded however large the catalog.
+    Returns catalog positions in the order they were picked.
+    """
+    deadline = time.perf_counter() + time_limit_ms / 1000
+    positions = np.array(index.positions_in(candidates), dtype=np.int64)
+    if not len(positions) or count <= 0:
+        return []
+
+    fatigue = np.zeros(len(index.muscles))
+    for muscle, value in muscle_fatigue.items():
+        if muscle in index.muscle_ids:
+            fatigue[index.muscle_ids[muscle]] = value
+    # Working a tired muscle again is worth less, and nothing once fully fatigued
+    freshness = np.clip(1 - fatigue, 0, 1)
+
+    muscles = index.muscle_matrix[positions]
+    average_fatigue = (muscles @ fatigue) / np.maximum(muscles.sum(axis=1), 1)
+
+    preferred_bits = 0
+    for name in preferred:
+        preferred_bits |= index.by_name.get(name, 0)
+    is_preferred = np.isin(positions, index.positions_in(candidates & preferred_bits))
+
+    noise = np.random.default_rng(rng.getrandbits(64)).random(len(positions))
+    base = (
+        bonus[positions]
+        + PREFERENCE_BONUS * is_preferred
+        - FATIGUE_PENALTY * average_fatigue
+        + VARIETY * noise
+    )
+
+    # Search only the exercises with the best possible contribution, so the
+    # cost past this point does not grow with the catalog
+    if len(positions) > CANDIDATE_POOL:
+        best_case = base + muscles @ (COVERAGE_GAIN[0] * freshness) + CATEGORY_GAIN[0]
+        keep = np.sort(np.argpartition(-best_case, CANDIDATE_POOL - 1)[:CANDIDATE_POOL])
+        positions, muscles, base = positions[keep], muscles[keep], base[keep]
+
+    categories = index.category_codes[positions]
+    sets = SETS_BY_DIFFICULTY.get(difficulty, 3)
+    rest = np.array([rest_seconds(category) for category in index.categories])[categories]
+    durations = sets * (WORK_SECONDS_PER_SET + rest) / 60
+    # A workout always has at least one exercise, however short
+    minutes = max(minutes, durations.min())
+
+    # Each plan: score, picks (indexes into positions), minutes used, and
+    # per muscle and category how often the plan works it
+    plans = [(0.0, [], 0.0)]
+    muscle_use = np.zeros((1, len(index.muscles)), dtype=np.int64)
+    category_use = np.zeros((1, len(index.categories)), dtype=np.int64)
+    width, branching = BEAM_WIDTH, BRANCHING
+
+    for _ in range(min(count, len(positions))):
+        if time.perf_counter() > deadline:
+            # Out of time: keep only the best plan and finish it greedily
+            plans, muscle_use, category_use = plans[:1], muscle_use[:1], category_use[:1]
+            width, branching = 1, 1
+
+        # Marginal value of every candidate for every plan in one product
+        coverage = COVERAGE_GAIN[np.minimum(muscle_use, 2)]
+        coverage = np.where(coverage > 0, coverage * freshness, coverage)
+        gains = (
+            base
+            + coverage @ muscles.T
+            + CATEGORY_GAIN[np.minimum(category_use, 2)][:, categories]
+        )
+        used = np.array([plan[2] for plan in plans])
+        gains[used[:, None] + durations > minutes] = -np.inf
+        for row, plan in enumerate(plans):
+            gains[row, plan[1]] = -np.inf
+
+        extended = {}
+        for row, (score, picks, minutes_used) in enumerate(plans):
+            feasible = np.flatnonzero(gains[row] > -np.inf)
+            if len(feasible) > branching:
+                feasible = feasible[np.argpartition(-gains[row, feasible], branching - 1)[:branching]]
+            for choice in feasible.tolist():
+                # The same exercises picked in another order are one plan
+                key = frozenset(picks + [choice])
+                new_score = score + gains[row, choice]
+                if key not in extended or extended[key][0] < new_score:
+                    extended[key] = (new_score, picks + [choice], minutes_used + durations[choice], row)
+
+        if not extended:
+            break
+        best = sorted(extended.values(), key=lambda plan: plan[0], reverse=True)[:width]
+        rows = [plan[3] for plan in best]
+        chosen = [plan[1][-1] for plan in best]
+        muscle_use = muscle_use[rows] + muscles[chosen].astype(np.int64)
+        category_use = category_use[rows]
+        category_use[np.arange(len(best)), categories[chosen]] += 1
+        plans = [plan[:3] for plan in best]
+
+    return positions[plans[0][1]].tolist()
@@ -1,22 +1,58 @@
-import cv2
 import mediapipe as mp
 import numpy as np
 import json
-from typing import Dict, List, Any, Tuple
-import tempfile
+from typing import Callable, Dict, List, Any, Tuple
+import asyncio
 import os
 
+from services.video_upload import spool_upload, VideoTooLarge, MAX_VIDEO_SECONDS
+from services.video_decoders import VideoDecoder, create_decoder
+from services.frame_sampling import FrameSampler
+from services.frame_pipeline import FramePipeline
+from services.pose_track import (
+    PoseTrack, X, Y, VISIBILITY,
+    LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW,
+    LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE
+)
+from services.result_cache import AnalysisCache, fingerprint
+from services.joint_angles import JOINT_INDEX, MIN_VISIBILITY, compute_joint_angles, bilateral_mean
+from services.rep_detection import RepDetector
+from models.form_models import FormAnalysisOptions
+
+# Speed/accuracy tiers mapped to MediaPipe Pose configurations.
+# Segmentation masks are never used by the scoring code, so they stay off.
+POSE_TIERS = {
+    "fast": {"model_complexity": 0, "enable_segmentation": False},
+    "balanced": {"model_complexity": 1, "enable_segmentation": False},
+    "accurate": {"model_complexity": 2, "enable_segmentation": False}
+}
+DEFAULT_POSE_TIER = os.getenv("FORM_ANALYSIS_TIER", "accurate")
+
+# Bump when checkpoint or movement scoring changes so cached results are
+# recomputed (cached pose tracks stay valid)
+RULES_VERSION = 4
+
+# Landmarks whose frame-to-frame motion defines smoothness
+SMOOTHNESS_LANDMARKS = [LEFT_ELBOW, RIGHT_ELBOW, LEFT_KNEE, RIGHT_KNEE]
+
 class FormAnalyzer:
-    def __init__(self):
+    def __init__(
+        self,
+        pool=None,
+        preload_tiers: List[str] = None,
+        result_cache: AnalysisCache = None,
+        track_cache: AnalysisCache = None
+    ):
+        # When a pool is given, pose inference runs in its worker processes
+        self.pool = pool
+        self.result_cache = result_cache
+        self.track_cache = track_cache
         self.mp_pose = mp.solutions.pose
         self.mp_drawing = mp.solutions.drawing_utils
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=2,
-            enable_segmentation=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        self._poses = {}
+        
+        for tier in preload_tiers or []:
+            self._get_pose(tier)
         
         # Exercise-specific form analysis rules
         self.exercise_rules = {
@@ -46,524 +82,581 @@ class FormAnalyzer:
             }
         }
     
+    def create_pose(self, tier: str = None):
+        """Build a new MediaPipe Pose model for a tier"""
+        tier = tier or DEFAULT_POSE_TIER
+        if tier not in POSE_TIERS:
+            raise ValueError(f"Unknown analysis tier: {tier}")
+        
+        return self.mp_pose.Pose(
+            static_image_mode=False,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+            **POSE_TIERS[tier]
+        )
+    
+    def _get_pose(self, tier: str = None):
+        """Shared MediaPipe Pose model for a tier, created on first use"""
+        tier = tier or DEFAULT_POSE_TIER
+        if tier not in self._poses:
+            self._poses[tier] = self.create_pose(tier)
+        return self._poses[tier]
+    
     async def analyze_form(
         self,
-        video_content: bytes,
+        video,
         exercise_name: str,
-        form_checkpoints: str = None
+        form_checkpoints: str = None,
+        options: FormAnalysisOptions = None
     ) -> Dict[str, Any]:
-        """Analyze exercise form from video using computer vision"""
+        """Analyze exercise form from an uploaded video using computer vision"""
+        
+        if options is None:
+            options = FormAnalysisOptions()
         
-        # Save video to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
-            temp_file.write(video_content)
-            temp_path = temp_file.name
+        # Stream the upload to disk instead of buffering it in memory
+        temp_path, content_hash = await spool_upload(video)
         
         try:
-            # Process video
-            analysis_results = self._process_video(temp_path, exercise_name)
-            
-            # Generate feedback
-            feedback = self._generate_feedback(analysis_results, exercise_name)
-            
-            return {
-                "overall_score": feedback["overall_score"],
-                "feedback": feedback["detailed_feedback"],
-                "improvements": feedback["improvements"],
-                "risk_level": feedback["risk_level"],
-                "rep_count": analysis_results["rep_count"],
-                "timing_analysis": analysis_results["timing"],
-                "form_breakdown": analysis_results["form_scores"]
-            }
+            return await self.analyze_file(temp_path, content_hash, exercise_name, options)
             
         finally:
             # Clean up temporary file
             if os.path.exists(temp_path):
                 os.unlink(temp_path)
     
-    def _process_video(self, video_path: str, exercise_name: str) -> Dict[str, Any]:
-        """Process video and extract pose data"""
-        cap = cv2.VideoCapture(video_path)
-        
-        if not cap.isOpened():
-            raise ValueError("Could not open video file")
-        
-        frames_data = []
-        frame_count = 0
+    async def analyze_file(
+        self,
+        video_path: str,
+        content_hash: str,
+        exercise_name: str,
+        options: FormAnalysisOptions,
+        progress: Callable[[int, int, int], None] = None
+    ) -> Dict[str, Any]:
+        """Analyze a video already on disk, identified by the SHA-256 of its content.
+
+        Repeat uploads are served from cache and pose inference runs only
+        on a miss. ``progress`` must be picklable when a pool is used.
+        """
+        options_key = options.model_dump()
+        result_key = fingerprint(
+            content_hash, self._normalize_exercise_name(exercise_name), options_key, RULES_VERSION
+        )
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Convert BGR to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.result_cache is not None:
+            cached = await self.result_cache.get(result_key)
+            if cached is not None:
+                return cached
+        
+        # The pose track only depends on the video, inference options and the
+        # joints adaptive sampling follows, so rule changes can reuse it
+        track_key = fingerprint(content_hash, self._key_joints(exercise_name), options_key)
+        track = await self.track_cache.get(track_key) if self.track_cache is not None else None
+        loop = asyncio.get_running_loop()
+        
+        if track is not None:
+            result = await loop.run_in_executor(
+                None, self.analyze_track, track, exercise_name, options
+            )
+        else:
+            keep_track = self.track_cache is not None
             
-            # Process frame with MediaPipe
-            results = self.pose.process(rgb_frame)
+            # Keep CPU-bound pose inference off the event loop
+            if self.pool is not None:
+                result = await self.pool.analyze_video(
+                    video_path, exercise_name, options, keep_track, progress
+                )
+            else:
+                result = await loop.run_in_executor(
+                    None, self.analyze_video, video_path, exercise_name, options, keep_track, progress
+                )
             
-            if results.pose_landmarks:
-                # Extract landmarks
-                landmarks = self._extract_landmarks(results.pose_landmarks)
+            track = result.pop("pose_track", None)
+            if track is not None:
+                await self.track_cache.set(track_key, track)
+        
+        if self.result_cache is not None:
+            await self.result_cache.set(result_key, result)
+        
+        return result
+    
+    def analyze_video(
+        self,
+        video_path: str,
+        exercise_name: str,
+        options: FormAnalysisOptions = None,
+        include_track: bool = False,
+        progress: Callable[[int, int, int], None] = None
+    ) -> Dict[str, Any]:
+        """Run the full (blocking) analysis on a video file.
+        
+        ``progress`` is called with (frames processed, total frames, reps so far)
+        about once per second of video.
+        """
+        if options is None:
+            options = FormAnalysisOptions()
+        
+        track = self._extract_pose_track(video_path, exercise_name, options, progress)
+        result = self.analyze_track(track, exercise_name, options)
+        
+        if include_track:
+            result["pose_track"] = track
+        return result
+    
+    def analyze_track(
+        self, track: PoseTrack, exercise_name: str, options: FormAnalysisOptions = None
+    ) -> Dict[str, Any]:
+        """Score an extracted pose track and build the analysis response"""
+        if options is None:
+            options = FormAnalysisOptions()
+        
+        analysis_results = self._analyze_pose_track(track, exercise_name)
+        
+        # Generate feedback
+        feedback = self._generate_feedback(analysis_results, exercise_name)
+        sampling = track.metadata.get("sampling", {})
+        
+        return {
+            "overall_score": feedback["overall_score"],
+            "feedback": feedback["detailed_feedback"],
+            "improvements": feedback["improvements"],
+            "risk_level": feedback["risk_level"],
+            "rep_count": analysis_results["rep_count"],
+            "timing_analysis": analysis_results["timing"],
+            "form_breakdown": analysis_results["form_scores"],
+            "reps": analysis_results["reps"],
+            "analysis_fps": sampling.get("analysis_fps"),
+            "sampling_mode": sampling.get("mode"),
+            "tier": track.metadata.get("tier", options.tier or DEFAULT_POSE_TIER)
+        }
+    
+    async def analyze_landmarks(self, data: bytes, exercise_name: str, fps: float) -> Dict[str, Any]:
+        """Analyze a pose track produced on the client, skipping video decode and inference"""
+        track = PoseTrack.from_landmark_array(data, fps)
+        if track.duration > MAX_VIDEO_SECONDS:
+            raise VideoTooLarge(f"Pose track exceeds maximum duration of {MAX_VIDEO_SECONDS:.0f} seconds")
+        
+        track.metadata["sampling"] = {"mode": "client", "analysis_fps": round(float(fps), 2)}
+        track.metadata["tier"] = None
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.analyze_track, track, exercise_name)
+    
+    def _extract_pose_track(
+        self,
+        video_path: str,
+        exercise_name: str,
+        options: FormAnalysisOptions,
+        progress: Callable[[int, int, int], None] = None
+    ) -> PoseTrack:
+        """Decode the video and run pose inference on sampled frames"""
+        with create_decoder(video_path, max_long_edge=options.max_long_edge) as decoder:
+            return self._decode_pose_track(decoder, exercise_name, options, progress)
+    
+    def _decode_pose_track(
+        self,
+        decoder: VideoDecoder,
+        exercise_name: str,
+        options: FormAnalysisOptions,
+        progress: Callable[[int, int, int], None] = None
+    ) -> PoseTrack:
+        """Run pose inference on the sampled frames of an open decoder"""
+        # Stream properties are read once, when the decoder opens the video
+        fps = decoder.fps
+        total_frames = decoder.frame_count
+        max_frames = int(MAX_VIDEO_SECONDS * fps)
+        
+        if total_frames > max_frames:
+            raise VideoTooLarge(f"Video exceeds maximum duration of {MAX_VIDEO_SECONDS:g}s")
+        
+        sampler = FrameSampler(fps, mode=options.sampling, target_fps=options.target_fps)
+        frames = FramePipeline(decoder, sampler, options.max_long_edge, max_frames)
+        pose = self._get_pose(options.tier)
+        
+        # Tracking state must not leak from the previous video on a reused worker
+        pose.reset()
+        
+        track = PoseTrack(capacity=total_frames // sampler.dense_stride if total_frames > 0 else 256)
+        track_key_angle = self._key_joints(exercise_name) is not None and (
+            sampler.mode == "adaptive" or progress is not None
+        )
+        rep_detector = RepDetector()
+        last_report = 0
+        # Keyframes are irregularly spaced, so each one stands for the real
+        # gap to the next, known only once that keyframe arrives
+        keyframes_only = decoder.keyframes_only
+        keyframe_start = None
+        
+        # Decode and preprocessing run on their own thread, a few frames ahead;
+        # in adaptive mode dense in-between frames are converted only if sampled
+        with frames:
+            for frame_index, rgb_frame in frames:
+                if keyframe_start is not None:
+                    track.set_last_weight(frame_index - keyframe_start)
+                    keyframe_start = None
                 
-                # Calculate angles
-                angles = self._calculate_angles(landmarks)
+                # Process frame with MediaPipe
+                results = pose.process(rgb_frame)
+                key_angle = None
                 
-                # Analyze form for this frame
-                form_scores = self._analyze_frame_form(landmarks, angles, exercise_name)
+                if results.pose_landmarks:
+                    # Store landmarks in the columnar pose track
+                    landmarks = track.append(frame_index, frame_index / fps, results.pose_landmarks)
+                    
+                    if track_key_angle:
+                        key_angle = float(self.key_angle_series(
+                            compute_joint_angles(landmarks[np.newaxis]), exercise_name, default=np.nan
+                        )[0])
+                        # Reps found so far, updated in O(1) per frame for progress reports
+                        rep_detector.update(len(track) - 1, frame_index / fps, key_angle)
+                        if np.isnan(key_angle):
+                            key_angle = None
                 
-                frames_data.append({
-                    "frame": frame_count,
-                    "landmarks": landmarks,
-                    "angles": angles,
-                    "form_scores": form_scores,
-                    "timestamp": frame_count / cap.get(cv2.CAP_PROP_FPS)
-                })
-            
-            frame_count += 1
-        
-        cap.release()
+                stride = sampler.observe(frame_index, key_angle)
+                if results.pose_landmarks:
+                    track.set_last_weight(stride)
+                    if keyframes_only:
+                        keyframe_start = frame_index
+                
+                if progress is not None and frames.frames_seen - last_report >= fps:
+                    last_report = frames.frames_seen
+                    progress(frames.frames_seen, int(total_frames), rep_detector.count)
         
-        if not frames_data:
+        if not len(track):
             raise ValueError("No pose detected in video")
+        # The last keyframe covers the rest of the video
+        if keyframe_start is not None and total_frames > keyframe_start:
+            track.set_last_weight(total_frames - keyframe_start)
+        
+        track.metadata["sampling"] = {
+            "mode": sampler.mode,
+            "analysis_fps": round(sampler.effective_fps(frames.frames_seen), 2)
+        }
+        return track
+    
+    def _analyze_pose_track(self, track: PoseTrack, exercise_name: str) -> Dict[str, Any]:
+        """Analyze angles, checkpoint scores and movement over a whole pose track"""
+        # Per-frame joint angles and checkpoint scores as (frames, columns) arrays
+        angles = self._calculate_track_angles(track)
+        checkpoint_names, form_scores = self._analyze_track_form(track, angles, exercise_name)
         
         # Analyze complete movement
-        movement_analysis = self._analyze_movement_pattern(frames_data, exercise_name)
+        movement_analysis = self._analyze_movement_pattern(
+            track, angles, checkpoint_names, form_scores, exercise_name
+        )
         
         return {
-            "frames_data": frames_data,
             "rep_count": movement_analysis["rep_count"],
             "timing": movement_analysis["timing"],
             "form_scores": movement_analysis["average_scores"],
-            "movement_quality": movement_analysis["quality_metrics"]
+            "movement_quality": movement_analysis["quality_metrics"],
+            "reps": movement_analysis["reps"]
         }
     
-    def _extract_landmarks(self, pose_landmarks) -> Dict[str, Tuple[float, float, float]]:
-        """Extract pose landmarks as coordinates"""
-        landmarks = {}
-        
-        landmark_names = [
-            'nose', 'left_eye_inner', 'left_eye', 'left_eye_outer',
-            'right_eye_inner', 'right_eye', 'right_eye_outer',
-            'left_ear', 'right_ear', 'mouth_left', 'mouth_right',
-            'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
-            'left_wrist', 'right_wrist', 'left_pinky', 'right_pinky',
-            'left_index', 'right_index', 'left_thumb', 'right_thumb',
-            'left_hip', 'right_hip', 'left_knee', 'right_knee',
-            'left_ankle', 'right_ankle', 'left_heel', 'right_heel',
-            'left_foot_index', 'right_foot_index'
-        ]
-        
-        for i, landmark in enumerate(pose_landmarks.landmark):
-            if i < len(landmark_names):
-                landmarks[landmark_names[i]] = (landmark.x, landmark.y, landmark.z)
-        
-        return landmarks
-    
-    def _calculate_angles(self, landmarks: Dict[str, Tuple[float, float, float]]) -> Dict[str, float]:
-        """Calculate joint angles from landmarks"""
-        angles = {}
-        
-        # Helper function to calculate angle between three points
-        def calculate_angle(p1, p2, p3):
-            """Calculate angle at p2 formed by p1-p2-p3"""
-            v1 = np.array([p1[0] - p2[0], p1[1] - p2[1]])
-            v2 = np.array([p3[0] - p2[0], p3[1] - p2[1]])
-            
-            cos_angle = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2))
-            cos_angle = np.clip(cos_angle, -1.0, 1.0)
-            angle = np.arccos(cos_angle)
-            
-            return np.degrees(angle)
-        
-        try:
-            # Left elbow angle
-            if all(key in landmarks for key in ['left_shoulder', 'left_elbow', 'left_wrist']):
-                angles['left_elbow'] = calculate_angle(
-                    landmarks['left_shoulder'],
-                    landmarks['left_elbow'],
-                    landmarks['left_wrist']
-                )
-            
-            # Right elbow angle
-            if all(key in landmarks for key in ['right_shoulder', 'right_elbow', 'right_wrist']):
-                angles['right_elbow'] = calculate_angle(
-                    landmarks['right_shoulder'],
-                    landmarks['right_elbow'],
-                    landmarks['right_wrist']
-                )
-            
-            # Left knee angle
-            if all(key in landmarks for key in ['left_hip', 'left_knee', 'left_ankle']):
-                angles['left_knee'] = calculate_angle(
-                    landmarks['left_hip'],
-                    landmarks['left_knee'],
-                    landmarks['left_ankle']
-                )
-            
-            # Right knee angle
-            if all(key in landmarks for key in ['right_hip', 'right_knee', 'right_ankle']):
-                angles['right_knee'] = calculate_angle(
-                    landmarks['right_hip'],
-                    landmarks['right_knee'],
-                    landmarks['right_ankle']
-                )
-            
-            # Hip angle (left side)
-            if all(key in landmarks for key in ['left_shoulder', 'left_hip', 'left_knee']):
-                angles['left_hip'] = calculate_angle(
-                    landmarks['left_shoulder'],
-                    landmarks['left_hip'],
-                    landmarks['left_knee']
-                )
-            
-            # Hip angle (right side)
-            if all(key in landmarks for key in ['right_shoulder', 'right_hip', 'right_knee']):
-                angles['right_hip'] = calculate_angle(
-                    landmarks['right_shoulder'],
-                    landmarks['right_hip'],
-                    landmarks['right_knee']
-                )
-            
-            # Shoulder angles
-            if all(key in landmarks for key in ['left_elbow', 'left_shoulder', 'left_hip']):
-                angles['left_shoulder'] = calculate_angle(
-                    landmarks['left_elbow'],
-                    landmarks['left_shoulder'],
-                    landmarks['left_hip']
-                )
-            
-            if all(key in landmarks for key in ['right_elbow', 'right_shoulder', 'right_hip']):
-                angles['right_shoulder'] = calculate_angle(
-                    landmarks['right_elbow'],
-                    landmarks['right_shoulder'],
-                    landmarks['right_hip']
-                )
-            
-        except Exception as e:
-            print(f"Error calculating angles: {e}")
-        
-        return angles
+    def _calculate_track_angles(self, track: PoseTrack) -> np.ndarray:
+        """Joint angles for every frame as a (frames, joints) array ordered like JOINT_NAMES"""
+        return compute_joint_angles(track.landmarks)
+    
+    def _analyze_track_form(
+        self, track: PoseTrack, angles: np.ndarray, exercise_name: str
+    ) -> Tuple[List[str], np.ndarray]:
+        """Score every frame, returning checkpoint names and a (frames, checkpoints) array"""
+        return self.score_checkpoints(track.landmarks, angles, exercise_name)
     
-    def _analyze_frame_form(
-        self, landmarks: Dict, angles: Dict, exercise_name: str
-    ) -> Dict[str, float]:
-        """Analyze form for a single frame"""
+    def _normalize_exercise_name(self, exercise_name: str) -> str:
+        return exercise_name.lower().replace('-', '_').replace(' ', '_')
+    
+    def score_checkpoints(
+        self, landmarks: np.ndarray, angles: np.ndarray, exercise_name: str
+    ) -> Tuple[List[str], np.ndarray]:
+        """Evaluate each checkpoint rule over whole (frames, ...) arrays at once"""
         
-        exercise_name_clean = exercise_name.lower().replace('-', '_').replace(' ', '_')
+        exercise_name_clean = self._normalize_exercise_name(exercise_name)
         
         if exercise_name_clean not in self.exercise_rules:
             # Generic form analysis
-            return self._generic_form_analysis(landmarks, angles)
+            checkpoints = self._generic_form_analysis()
+        else:
+            checkpoints = self.exercise_rules[exercise_name_clean]["checkpoints"]
         
-        rules = self.exercise_rules[exercise_name_clean]
-        form_scores = {}
+        scores = np.empty((len(landmarks), len(checkpoints)), dtype=np.float32)
         
         # Run exercise-specific checkpoints
-        for checkpoint_name, checkpoint_func in rules["checkpoints"].items():
+        for i, (checkpoint_name, checkpoint_func) in enumerate(checkpoints.items()):
             try:
-                score = checkpoint_func(landmarks, angles)
-                form_scores[checkpoint_name] = max(0, min(100, score))
+                column = np.asarray(checkpoint_func(landmarks, angles), dtype=np.float64)
+                # Frames a rule cannot score fall back to the default
+                column = np.where(np.isnan(column), 50, column)
+                scores[:, i] = np.clip(column, 0, 100)
             except Exception as e:
                 print(f"Error in checkpoint {checkpoint_name}: {e}")
-                form_scores[checkpoint_name] = 50  # Default score
+                scores[:, i] = 50  # Default score
         
-        return form_scores
+        return list(checkpoints), scores
+    
+    def _joint_angle(self, angles: np.ndarray, joint: str, default: float) -> np.ndarray:
+        """One joint's angle column, with missing frames replaced by a default"""
+        return np.nan_to_num(angles[:, JOINT_INDEX[joint]], nan=default).astype(np.float64)
+    
+    def _coordinate(self, landmarks: np.ndarray, landmark: int, axis: int) -> np.ndarray:
+        return landmarks[:, landmark, axis].astype(np.float64)
+    
+    def _alignment_score(self, landmarks: np.ndarray, strictness: float) -> np.ndarray:
+        """Score how straight the shoulder-hip-ankle line is"""
+        shoulder_y = (self._coordinate(landmarks, LEFT_SHOULDER, Y) + self._coordinate(landmarks, RIGHT_SHOULDER, Y)) / 2
+        hip_y = (self._coordinate(landmarks, LEFT_HIP, Y) + self._coordinate(landmarks, RIGHT_HIP, Y)) / 2
+        ankle_y = (self._coordinate(landmarks, LEFT_ANKLE, Y) + self._coordinate(landmarks, RIGHT_ANKLE, Y)) / 2
+        
+        # Calculate deviation from straight line
+        total_height = np.abs(shoulder_y - ankle_y)
+        hip_deviation = np.abs(hip_y - (shoulder_y + ankle_y) / 2)
+        
+        alignment_score = 100 - hip_deviation / np.where(total_height > 0, total_height, 1) * strictness
+        return np.where(total_height > 0, np.maximum(0, alignment_score), 50)
     
-    def _check_pushup_alignment(self, landmarks: Dict, angles: Dict) -> float:
+    def _check_pushup_alignment(self, landmarks: np.ndarray, angles: np.ndarray) -> np.ndarray:
         """Check body alignment for push-ups"""
-        try:
-            # Check if body forms a straight line
-            shoulder_y = (landmarks['left_shoulder'][1] + landmarks['right_shoulder'][1]) / 2
-            hip_y = (landmarks['left_hip'][1] + landmarks['right_hip'][1]) / 2
-            ankle_y = (landmarks['left_ankle'][1] + landmarks['right_ankle'][1]) / 2
-            
-            # Calculate deviation from straight line
-            total_height = abs(shoulder_y - ankle_y)
-            hip_deviation = abs(hip_y - (shoulder_y + ankle_y) / 2)
-            
-            if total_height > 0:
-                alignment_score = 100 - (hip_deviation / total_height * 200)
-                return max(0, alignment_score)
-            
-            return 50
-        except:
-            return 50
+        # Check if body forms a straight line
+        return self._alignment_score(landmarks, strictness=200)
     
-    def _check_pushup_elbows(self, landmarks: Dict, angles: Dict) -> float:
+    def _check_pushup_elbows(self, landmarks: np.ndarray, angles: np.ndarray) -> np.ndarray:
         """Check elbow position for push-ups"""
-        try:
-            left_elbow = angles.get('left_elbow', 90)
-            right_elbow = angles.get('right_elbow', 90)
-            
-            # Ideal elbow angle during push-up is around 45-90 degrees
-            ideal_range = (45, 90)
-            
-            def score_angle(angle):
-                if ideal_range[0] <= angle <= ideal_range[1]:
-                    return 100
-                else:
-                    deviation = min(abs(angle - ideal_range[0]), abs(angle - ideal_range[1]))
-                    return max(0, 100 - deviation * 2)
-            
-            left_score = score_angle(left_elbow)
-            right_score = score_angle(right_elbow)
-            
-            return (left_score + right_score) / 2
-        except:
-            return 50
+        # Ideal elbow angle during push-up is around 45-90 degrees
+        ideal_range = (45, 90)
+        
+        def score_angle(angle):
+            deviation = np.minimum(np.abs(angle - ideal_range[0]), np.abs(angle - ideal_range[1]))
+            in_range = (angle >= ideal_range[0]) & (angle <= ideal_range[1])
+            return np.where(in_range, 100, np.maximum(0, 100 - deviation * 2))
+        
+        left_score = score_angle(self._joint_angle(angles, 'left_elbow', 90))
+        right_score = score_angle(self._joint_angle(angles, 'right_elbow', 90))
+        
+        return (left_score + right_score) / 2
     
-    def _check_pushup_rom(self, landmarks: Dict, angles: Dict) -> float:
+    def _check_pushup_rom(self, landmarks: np.ndarray, angles: np.ndarray) -> np.ndarray:
         """Check range of motion for push-ups"""
-        try:
-            # This would need to be calculated across multiple frames
-            # For now, return a basic score based on elbow angles
-            left_elbow = angles.get('left_elbow', 90)
-            right_elbow = angles.get('right_elbow', 90)
-            
-            avg_elbow = (left_elbow + right_elbow) / 2
-            
-            # Good ROM means elbows bend to around 45-60 degrees
-            if 45 <= avg_elbow <= 60:
-                return 100
-            elif 30 <= avg_elbow <= 75:
-                return 80
-            else:
-                return 60
-        except:
-            return 50
+        # This would need to be calculated across multiple frames
+        # For now, return a basic score based on elbow angles
+        avg_elbow = (
+            self._joint_angle(angles, 'left_elbow', 90) + self._joint_angle(angles, 'right_elbow', 90)
+        ) / 2
+        
+        # Good ROM means elbows bend to around 45-60 degrees
+        return np.select(
+            [(avg_elbow >= 45) & (avg_elbow <= 60), (avg_elbow >= 30) & (avg_elbow <= 75)],
+            [100, 80],
+            default=60
+        )
     
-    def _check_squat_knees(self, landmarks: Dict, angles: Dict) -> float:
+    def _check_squat_knees(self, landmarks: np.ndarray, angles: np.ndarray) -> np.ndarray:
         """Check knee tracking for squats"""
-        try:
-            # Check if knees track over toes (no valgus collapse)
-            left_knee_x = landmarks['left_knee'][0]
-            left_ankle_x = landmarks['left_ankle'][0]
-            right_knee_x = landmarks['right_knee'][0]
-            right_ankle_x = landmarks['right_ankle'][0]
-            
-            # Calculate knee-ankle alignment
-            left_alignment = abs(left_knee_x - left_ankle_x)
-            right_alignment = abs(right_knee_x - right_ankle_x)
-            
-            # Good alignment means knees are close to being over ankles
-            max_deviation = 0.1  # 10% of body width
-            
-            left_score = max(0, 100 - (left_alignment / max_deviation * 100))
-            right_score = max(0, 100 - (right_alignment / max_deviation * 100))
-            
-            return (left_score + right_score) / 2
-        except:
-            return 50
+        # Check if knees track over toes (no valgus collapse)
+        left_alignment = np.abs(self._coordinate(landmarks, LEFT_KNEE, X) - self._coordinate(landmarks, LEFT_ANKLE, X))
+        right_alignment = np.abs(self._coordinate(landmarks, RIGHT_KNEE, X) - self._coordinate(landmarks, RIGHT_ANKLE, X))
+        
+        # Good alignment means knees are close to being over ankles
+        max_deviation = 0.1  # 10% of body width
+        
+        left_score = np.maximum(0, 100 - (left_alignment / max_deviation * 100))
+        right_score = np.maximum(0, 100 - (right_alignment / max_deviation * 100))
+        
+        return (left_score + right_score) / 2
     
-    def _check_squat_depth(self, landmarks: Dict, angles: Dict) -> float:
+    def _check_squat_depth(self, landmarks: np.ndarray, angles: np.ndarray) -> np.ndarray:
         """Check squat depth"""
-        try:
-            left_knee = angles.get('left_knee', 90)
-            right_knee = angles.get('right_knee', 90)
-            
-            avg_knee_angle = (left_knee + right_knee) / 2
-            
-            # Good squat depth: knee angle around 90 degrees or less
-            if avg_knee_angle <= 90:
-                return 100
-            elif avg_knee_angle <= 110:
-                return 80
-            elif avg_knee_angle <= 130:
-                return 60
-            else:
-                return 40
-        except:
-            return 50
+        avg_knee_angle = (
+            self._joint_angle(angles, 'left_knee', 90) + self._joint_angle(angles, 'right_knee', 90)
+        ) / 2
+        
+        # Good squat depth: knee angle around 90 degrees or less
+        return np.select(
+            [avg_knee_angle <= 90, avg_knee_angle <= 110, avg_knee_angle <= 130],
+            [100, 80, 60],
+            default=40
+        )
     
-    def _check_squat_back(self, landmarks: Dict, angles: Dict) -> float:
+    def _check_squat_back(self, landmarks: np.ndarray, angles: np.ndarray) -> np.ndarray:
         """Check back position for squats"""
-        try:
-            # Check torso angle
-            shoulder_y = (landmarks['left_shoulder'][1] + landmarks['right_shoulder'][1]) / 2
-            hip_y = (landmarks['left_hip'][1] + landmarks['right_hip'][1]) / 2
-            
-            # Calculate torso lean
-            torso_lean = abs(landmarks['left_shoulder'][0] - landmarks['left_hip'][0])
-            
-            # Moderate forward lean is acceptable, excessive lean is not
-            if torso_lean < 0.1:
-                return 100
-            elif torso_lean < 0.2:
-                return 80
-            else:
-                return 60
-        except:
-            return 50
+        # Calculate torso lean
+        torso_lean = np.abs(self._coordinate(landmarks, LEFT_SHOULDER, X) - self._coordinate(landmarks, LEFT_HIP, X))
+        
+        # Moderate forward lean is acceptable, excessive lean is not
+        return np.select([torso_lean < 0.1, torso_lean < 0.2], [100, 80], default=60)
     
-    def _check_plank_alignment(self, landmarks: Dict, angles: Dict) -> float:
+    def _check_plank_alignment(self, landmarks: np.ndarray, angles: np.ndarray) -> np.ndarray:
         """Check plank alignment"""
-        try:
-            # Similar to push-up alignment but stricter
-            shoulder_y = (landmarks['left_shoulder'][1] + landmarks['right_shoulder'][1]) / 2
-            hip_y = (landmarks['left_hip'][1] + landmarks['right_hip'][1]) / 2
-            ankle_y = (landmarks['left_ankle'][1] + landmarks['right_ankle'][1]) / 2
-            
-            # Check for straight line
-            total_height = abs(shoulder_y - ankle_y)
-            hip_deviation = abs(hip_y - (shoulder_y + ankle_y) / 2)
-            
-            if total_height > 0:
-                alignment_score = 100 - (hip_deviation / total_height * 300)  # Stricter than push-up
-                return max(0, alignment_score)
-            
-            return 50
-        except:
-            return 50
+        # Similar to push-up alignment but stricter
+        return self._alignment_score(landmarks, strictness=300)
     
-    def _check_plank_hips(self, landmarks: Dict, angles: Dict) -> float:
+    def _check_plank_hips(self, landmarks: np.ndarray, angles: np.ndarray) -> np.ndarray:
         """Check hip position for plank"""
-        try:
-            left_hip = angles.get('left_hip', 180)
-            right_hip = angles.get('right_hip', 180)
-            
-            avg_hip_angle = (left_hip + right_hip) / 2
-            
-            # Ideal hip angle for plank is around 180 degrees (straight)
-            deviation = abs(180 - avg_hip_angle)
-            score = max(0, 100 - deviation * 2)
-            
-            return score
-        except:
-            return 50
+        avg_hip_angle = (
+            self._joint_angle(angles, 'left_hip', 180) + self._joint_angle(angles, 'right_hip', 180)
+        ) / 2
+        
+        # Ideal hip angle for plank is around 180 degrees (straight)
+        deviation = np.abs(180 - avg_hip_angle)
+        return np.maximum(0, 100 - deviation * 2)
     
-    def _check_plank_shoulders(self, landmarks: Dict, angles: Dict) -> float:
+    def _check_plank_shoulders(self, landmarks: np.ndarray, angles: np.ndarray) -> np.ndarray:
         """Check shoulder stability for plank"""
-        try:
-            # Check if shoulders are directly over elbows/wrists
-            left_shoulder_x = landmarks['left_shoulder'][0]
-            left_elbow_x = landmarks['left_elbow'][0]
-            right_shoulder_x = landmarks['right_shoulder'][0]
-            right_elbow_x = landmarks['right_elbow'][0]
-            
-            left_alignment = abs(left_shoulder_x - left_elbow_x)
-            right_alignment = abs(right_shoulder_x - right_elbow_x)
-            
-            max_deviation = 0.05  # 5% deviation allowed
-            
-            left_score = max(0, 100 - (left_alignment / max_deviation * 100))
-            right_score = max(0, 100 - (right_alignment / max_deviation * 100))
-            
-            return (left_score + right_score) / 2
-        except:
-            return 50
+        # Check if shoulders are directly over elbows/wrists
+        left_alignment = np.abs(self._coordinate(landmarks, LEFT_SHOULDER, X) - self._coordinate(landmarks, LEFT_ELBOW, X))
+        right_alignment = np.abs(self._coordinate(landmarks, RIGHT_SHOULDER, X) - self._coordinate(landmarks, RIGHT_ELBOW, X))
+        
+        max_deviation = 0.05  # 5% deviation allowed
+        
+        left_score = np.maximum(0, 100 - (left_alignment / max_deviation * 100))
+        right_score = np.maximum(0, 100 - (right_alignment / max_deviation * 100))
+        
+        return (left_score + right_score) / 2
     
-    def _generic_form_analysis(self, landmarks: Dict, angles: Dict) -> Dict[str, float]:
-        """Generic form analysis for unknown exercises"""
+    def _generic_form_analysis(self) -> Dict[str, Any]:
+        """Generic form checkpoints for unknown exercises"""
         return {
-            "posture": 75,
-            "symmetry": 80,
-            "stability": 70
+            "posture": lambda landmarks, angles: np.full(len(landmarks), 75.0),
+            "symmetry": lambda landmarks, angles: np.full(len(landmarks), 80.0),
+            "stability": lambda landmarks, angles: np.full(len(landmarks), 70.0)
         }
     
-    def _analyze_movement_pattern(self, frames_data: List[Dict], exercise_name: str) -> Dict[str, Any]:
+    def _analyze_movement_pattern(
+        self,
+        track: PoseTrack,
+        angles: np.ndarray,
+        checkpoint_names: List[str],
+        form_scores: np.ndarray,
+        exercise_name: str
+    ) -> Dict[str, Any]:
         """Analyze movement pattern across all frames"""
         
-        if not frames_data:
+        if not len(track):
             return {
                 "rep_count": 0,
                 "timing": {},
                 "average_scores": {},
-                "quality_metrics": {}
+                "quality_metrics": {},
+                "reps": None
             }
         
-        # Calculate average form scores
-        all_scores = {}
-        for frame in frames_data:
-            for checkpoint, score in frame["form_scores"].items():
-                if checkpoint not in all_scores:
-                    all_scores[checkpoint] = []
-                all_scores[checkpoint].append(score)
-        
+        # Calculate average form scores, weighting sampled frames by the time they cover
+        weighted = np.average(form_scores, axis=0, weights=track.weights)
         average_scores = {
-            checkpoint: sum(scores) / len(scores)
-            for checkpoint, scores in all_scores.items()
+            checkpoint: float(score)
+            for checkpoint, score in zip(checkpoint_names, weighted)
         }
         
-        # Count repetitions (simplified - based on movement patterns)
-        rep_count = self._count_repetitions(frames_data, exercise_name)
+        # Segment the track into reps and score each one
+        reps = self._detect_reps(track, angles, exercise_name)
+        if reps is not None and len(track) < 10:
+            # Too few frames to trust any rep boundaries
+            reps = []
+        rep_count = self._count_repetitions(track, reps)
+        rep_analysis = self._analyze_reps(track, angles, reps, checkpoint_names, form_scores, exercise_name)
         
         # Analyze timing
-        timing_analysis = self._analyze_timing(frames_data, rep_count)
+        timing_analysis = self._analyze_timing(track, rep_count)
         
         # Quality metrics
-        quality_metrics = self._calculate_quality_metrics(frames_data)
+        quality_metrics = self._calculate_quality_metrics(track, form_scores)
         
         return {
             "rep_count": rep_count,
             "timing": timing_analysis,
             "average_scores": average_scores,
-            "quality_metrics": quality_metrics
+            "quality_metrics": quality_metrics,
+            "reps": rep_analysis
         }
     
-    def _count_repetitions(self, frames_data: List[Dict], exercise_name: str) -> int:
-        """Count repetitions based on movement patterns"""
+    def _count_repetitions(self, track: PoseTrack, reps: List[Dict[str, Any]]) -> int:
+        """Count repetitions from the detected rep boundaries"""
         
-        if len(frames_data) < 10:  # Need minimum frames
+        if len(track) < 10:  # Need minimum frames
             return 0
         
-        # Use key angle changes to detect reps
-        if 'push' in exercise_name.lower():
+        if reps is None:
+            # Generic rep counting: estimate roughly one rep per second of video
+            return max(1, int(track.duration))
+        
+        # The detector found these reps, possibly none
+        return len(reps)
+    
+    def _detect_reps(self, track: PoseTrack, angles: np.ndarray, exercise_name: str) -> List[Dict[str, Any]]:
+        """Rep boundaries (start/bottom/end track rows) from the key joint angle, or None"""
+        key_angles = self.key_angle_series(angles, exercise_name, default=np.nan)
+        if key_angles is None:
+            return None
+        
+        return RepDetector().detect_reps(track.timestamps, key_angles)
+    
+    def _analyze_reps(
+        self,
+        track: PoseTrack,
+        angles: np.ndarray,
+        reps: List[Dict[str, Any]],
+        checkpoint_names: List[str],
+        form_scores: np.ndarray,
+        exercise_name: str
+    ) -> List[Dict[str, Any]]:
+        """Per-rep checkpoint scores, tempo and range of motion, or None without rep boundaries"""
+        if reps is None:
+            return None
+        
+        key_angles = self.key_angle_series(angles, exercise_name, default=np.nan)
+        timestamps = track.timestamps
+        weights = track.weights
+        rep_analysis = []
+        
+        for number, rep in enumerate(reps, start=1):
+            # Only the frames of this rep, so setup and rest frames do not count
+            rows = slice(rep["start"], rep["end"] + 1)
+            scores = np.average(form_scores[rows], axis=0, weights=weights[rows])
+            rep_angles = key_angles[rows]
+            
+            rep_analysis.append({
+                "rep": number,
+                "start_time": float(timestamps[rep["start"]]),
+                "end_time": float(timestamps[rep["end"]]),
+                "duration": float(timestamps[rep["end"]] - timestamps[rep["start"]]),
+                "eccentric_duration": float(timestamps[rep["bottom"]] - timestamps[rep["start"]]),
+                "concentric_duration": float(timestamps[rep["end"]] - timestamps[rep["bottom"]]),
+                "range_of_motion": float(np.nanmax(rep_angles) - np.nanmin(rep_angles)),
+                "score": float(scores.mean()),
+                "form_scores": {
+                    checkpoint: float(score)
+                    for checkpoint, score in zip(checkpoint_names, scores)
+                }
+            })
+        
+        return rep_analysis
+    
+    def _key_joints(self, exercise_name: str) -> Tuple[str, str]:
+        """Left/right joints whose angle tracks rep progress, or None"""
+        name = exercise_name.lower()
+        
+        if 'push' in name:
             # Use elbow angles for push-ups
-            angles = []
-            for frame in frames_data:
-                left_elbow = frame["angles"].get('left_elbow', 90)
-                right_elbow = frame["angles"].get('right_elbow', 90)
-                angles.append((left_elbow + right_elbow) / 2)
+            return ('left_elbow', 'right_elbow')
         
-        elif 'squat' in exercise_name.lower():
+        if 'squat' in name:
             # Use knee angles for squats
-            angles = []
-            for frame in frames_data:
-                left_knee = frame["angles"].get('left_knee', 90)
-                right_knee = frame["angles"].get('right_knee', 90)
-                angles.append((left_knee + right_knee) / 2)
+            return ('left_knee', 'right_knee')
         
-        else:
-            # Generic rep counting
-            return max(1, len(frames_data) // 30)  # Estimate based on video length
-        
-        # Find peaks and valleys in angle data
-        reps = self._find_movement_cycles(angles)
-        return max(1, reps)
-    
-    def _find_movement_cycles(self, angles: List[float]) -> int:
-        """Find movement cycles in angle data"""
-        if len(angles) < 10:
-            return 1
-        
-        # Smooth the data
-        smoothed = []
-        window = 3
-        for i in range(len(angles)):
-            start = max(0, i - window)
-            end = min(len(angles), i + window + 1)
-            smoothed.append(sum(angles[start:end]) / (end - start))
-        
-        # Find local minima (bottom of movement)
-        minima = []
-        for i in range(1, len(smoothed) - 1):
-            if smoothed[i] < smoothed[i-1] and smoothed[i] < smoothed[i+1]:
-                minima.append(i)
-        
-        # Filter minima that are too close together
-        filtered_minima = []
-        min_distance = len(smoothed) // 10  # Minimum frames between reps
-        
-        for minimum in minima:
-            if not filtered_minima or minimum - filtered_minima[-1] >= min_distance:
-                filtered_minima.append(minimum)
-        
-        return len(filtered_minima)
-    
-    def _analyze_timing(self, frames_data: List[Dict], rep_count: int) -> Dict[str, Any]:
+        return None
+    
+    def key_angle_series(
+        self, angles: np.ndarray, exercise_name: str, default: float = 90.0
+    ) -> np.ndarray:
+        """Key joint angle for every frame of an angle matrix, or None"""
+        joints = self._key_joints(exercise_name)
+        if joints is None:
+            return None
+        
+        return bilateral_mean(angles, joints, default=default)
+    
+    def _analyze_timing(self, track: PoseTrack, rep_count: int) -> Dict[str, Any]:
         """Analyze timing of movements"""
-        total_time = frames_data[-1]["timestamp"] - frames_data[0]["timestamp"]
+        total_time = track.duration
         
         return {
             "total_duration": total_time,
@@ -571,22 +664,19 @@ class FormAnalyzer:
             "tempo": "controlled" if total_time / max(1, rep_count) > 2 else "fast"
         }
     
-    def _calculate_quality_metrics(self, frames_data: List[Dict]) -> Dict[str, Any]:
+    def _calculate_quality_metrics(self, track: PoseTrack, form_scores: np.ndarray) -> Dict[str, Any]:
         """Calculate overall movement quality metrics"""
         
         # Calculate consistency (standard deviation of form scores)
-        all_scores = []
-        for frame in frames_data:
-            frame_avg = sum(frame["form_scores"].values()) / len(frame["form_scores"])
-            all_scores.append(frame_avg)
+        frame_averages = form_scores.mean(axis=1)
         
-        if len(all_scores) > 1:
-            consistency = 100 - (np.std(all_scores) * 2)  # Lower std = higher consistency
+        if len(frame_averages) > 1:
+            consistency = 100 - (float(np.std(frame_averages)) * 2)  # Lower std = higher consistency
         else:
             consistency = 100
         
         # Calculate smoothness (how smooth the movement is)
-        smoothness = self._calculate_smoothness(frames_data)
+        smoothness = self._calculate_smoothness(track)
         
         return {
             "consistency": max(0, min(100, consistency)),
@@ -594,37 +684,28 @@ class FormAnalyzer:
             "overall_quality": (consistency + smoothness) / 2
         }
     
-    def _calculate_smoothness(self, frames_data: List[Dict]) -> float:
+    def _calculate_smoothness(self, track: PoseTrack) -> float:
         """Calculate movement smoothness"""
-        if len(frames_data) < 3:
+        if len(track) < 3:
             return 100
         
-        # Calculate velocity changes in key joints
-        velocities = []
+        # Calculate velocity changes in key joints, ignoring occluded landmarks
+        joints = track.landmarks[:, SMOOTHNESS_LANDMARKS, :]
+        position_changes = np.linalg.norm(np.diff(joints[..., :2].astype(np.float64), axis=0), axis=2)
+        visible = joints[..., VISIBILITY] >= MIN_VISIBILITY
+        visible = visible[1:] & visible[:-1]
         
-        for i in range(1, len(frames_data)):
-            prev_frame = frames_data[i-1]
-            curr_frame = frames_data[i]
-            
-            # Calculate position changes
-            position_changes = []
-            for landmark in ['left_elbow', 'right_elbow', 'left_knee', 'right_knee']:
-                if landmark in prev_frame["landmarks"] and landmark in curr_frame["landmarks"]:
-                    prev_pos = prev_frame["landmarks"][landmark]
-                    curr_pos = curr_frame["landmarks"][landmark]
-                    
-                    change = np.sqrt(
-                        (curr_pos[0] - prev_pos[0])**2 + 
-                        (curr_pos[1] - prev_pos[1])**2
-                    )
-                    position_changes.append(change)
-            
-            if position_changes:
-                velocities.append(sum(position_changes) / len(position_changes))
+        counts = visible.sum(axis=1)
+        mean_changes = np.where(visible, position_changes, 0).sum(axis=1) / np.maximum(counts, 1)
+        
+        # Normalize by the real frame gap, which varies under adaptive sampling
+        # and keyframe-only decode, so sampled tracks stay comparable
+        frame_gaps = np.maximum(1, np.diff(track.frame_indices))
+        velocities = (mean_changes / frame_gaps)[counts > 0]
         
         if len(velocities) > 1:
             # Smoothness is inversely related to velocity variance
-            velocity_variance = np.var(velocities)
+            velocity_variance = float(np.var(velocities))
             smoothness = max(0, 100 - velocity_variance * 1000)
         else:
             smoothness = 100
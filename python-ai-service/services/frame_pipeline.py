@@ -0,0 +1,172 @@
+import os
+import queue
+import threading
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from services.frame_preprocessing import FramePreprocessor
+from services.frame_sampling import FrameSampler
+from services.video_decoders import VideoDecoder
+from services.video_upload import MAX_VIDEO_SECONDS, VideoTooLarge
+
+# Frames decoded ahead of pose inference; 0 decodes on the inference thread
+PIPELINE_DEPTH = int(os.getenv("FORM_ANALYSIS_PIPELINE_DEPTH", 4))
+
+_END = object()
+
+
+class FramePipeline:
+    """Decode and preprocess frames on a background thread ahead of inference.
+
+    The decode stage feeds RGB frames into a bounded queue, so it blocks
+    once ``depth`` frames are waiting and memory stays capped however fast
+    decode runs. Decode and MediaPipe inference both release the GIL, so
+    the stages overlap on multi-core hosts.
+
+    Adaptive sampling analyzes every base-grid frame, but only knows which
+    dense frames between them it wants once inference on the frames before
+    is done. The decode thread therefore reads and converts base-grid frames
+    ahead, and reads the dense in-between frames without converting them;
+    the consuming thread converts one only if the sampler still wants it.
+    This trades decoding in-between frames that may go unused for keeping
+    decode off the inference thread. With ``depth`` 0 decode runs on the
+    consuming thread, which follows the sampler exactly and only grabs the
+    frames it skips.
+
+    Iterating yields ``(frame_index, rgb_frame)``; ``frames_seen`` is the
+    number of source frames consumed so far. Frames come from rings of
+    preprocessing buffers and stay valid until ``depth + 1`` later frames.
+    """
+
+    def __init__(
+        self,
+        decoder: VideoDecoder,
+        sampler: FrameSampler,
+        max_long_edge: Optional[int] = None,
+        max_frames: Optional[int] = None,
+        depth: int = PIPELINE_DEPTH
+    ):
+        self.decoder = decoder
+        self.sampler = sampler
+        self.max_frames = max_frames
+        self.frames_seen = 0
+
+        self.depth = depth
+        # Keyframe-only decode is already sparse, so every frame it yields counts
+        self._follow_sampler = sampler.mode == "adaptive" and not decoder.keyframes_only
+        if decoder.keyframes_only:
+            self._stride = 1
+        elif self._follow_sampler:
+            self._stride = sampler.dense_stride
+        else:
+            self._stride = sampler.base_stride
+
+        # One buffer per queued frame plus the ones being filled and consumed,
+        # and a second ring for in-between frames converted by the consumer
+        self._preprocessors = [FramePreprocessor(max_long_edge) for _ in range(self.depth + 2)]
+        self._inline_preprocessors = (
+            [FramePreprocessor(max_long_edge) for _ in range(self.depth + 2)]
+            if self._follow_sampler and self.depth > 0 and not decoder.output_rgb else []
+        )
+        self._queue = queue.Queue(maxsize=max(1, self.depth))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _decode(self) -> Iterator[Tuple[int, int, np.ndarray, bool]]:
+        """Decode stage: yield (frame_index, frames_seen, frame, converted) for candidate frames"""
+        frame_count = 0
+        converted = 0
+
+        while not self._stop.is_set():
+            # Container metadata can lie, so enforce the limit while decoding too,
+            # once a frame past it has actually been grabbed or read
+            if self.max_frames is not None and frame_count > self.max_frames:
+                raise VideoTooLarge(f"Video exceeds maximum duration of {MAX_VIDEO_SECONDS:g}s")
+
+            # Frames the sampler will not analyze are grabbed but never converted
+            in_between = self._follow_sampler and frame_count % self.sampler.base_stride != 0
+            if frame_count % self._stride or (
+                in_between and self.depth <= 0 and not self.sampler.should_process(frame_count)
+            ):
+                if not self.decoder.grab():
+                    break
+                frame_count = self.decoder.position + 1
+                continue
+
+            frame = self.decoder.read()
+            if frame is None:
+                break
+            frame_index = self.decoder.position
+            frame_count = frame_index + 1
+
+            # Downscale and convert BGR to RGB unless the decoder already did;
+            # in-between frames read ahead are left to the consumer
+            deferred = in_between and bool(self._inline_preprocessors)
+            if not self.decoder.output_rgb and not deferred:
+                frame = self._preprocessors[converted % len(self._preprocessors)].process(frame)
+                converted += 1
+
+            yield frame_index, frame_count, frame, not deferred
+
+        yield None, frame_count, _END, True
+
+    def _run(self):
+        """Decode thread body: push frames, or the error that stopped decoding"""
+        try:
+            for item in self._decode():
+                while not self._stop.is_set():
+                    try:
+                        self._queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        except Exception as e:
+            self._queue.put((None, self.frames_seen, e, True))
+
+    def _items(self) -> Iterator[Tuple[int, int, object, bool]]:
+        if self.depth <= 0:
+            yield from self._decode()
+            return
+
+        self._thread = threading.Thread(target=self._run, name="form-decode", daemon=True)
+        self._thread.start()
+        while True:
+            yield self._queue.get()
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        inline_converted = 0
+        try:
+            for frame_index, frames_seen, frame, converted in self._items():
+                if isinstance(frame, Exception):
+                    raise frame
+                self.frames_seen = frames_seen
+                if frame is _END:
+                    return
+
+                if self.decoder.keyframes_only or self.sampler.should_process(frame_index):
+                    if not converted:
+                        ring = self._inline_preprocessors
+                        frame = ring[inline_converted % len(ring)].process(frame)
+                        inline_converted += 1
+                    yield frame_index, frame
+        finally:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the decode thread; call before releasing the decoder"""
+        self._stop.set()
+        if self._thread is not None:
+            # Unblock a producer waiting on a full queue
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._thread = None
@@ -0,0 +1,54 @@
+import os
+from typing import Optional
+
+import cv2
+import numpy as np
+
+DEFAULT_MAX_LONG_EDGE = int(os.getenv("FORM_ANALYSIS_MAX_LONG_EDGE", 640))
+
+
+class FramePreprocessor:
+    """Downscale BGR frames and convert them to RGB using reusable buffers.
+
+    Pose landmarks are normalized to the frame size, so shrinking the frame
+    before inference leaves downstream scoring unchanged while avoiding
+    full-resolution color conversion and copies.
+    """
+
+    def __init__(self, max_long_edge: Optional[int] = None):
+        self.max_long_edge = max_long_edge or DEFAULT_MAX_LONG_EDGE
+        self._source_shape = None
+        self._target_size = None
+        self._resized = None
+        self._rgb = None
+
+    def _allocate(self, frame: np.ndarray):
+        """Size output buffers for the stream's frame shape"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.max_long_edge / max(height, width))
+        target_width = max(1, int(round(width * scale)))
+        target_height = max(1, int(round(height * scale)))
+
+        self._source_shape = frame.shape
+        self._target_size = (target_width, target_height) if scale < 1.0 else None
+        self._resized = (
+            np.empty((target_height, target_width, 3), dtype=np.uint8)
+            if self._target_size else None
+        )
+        self._rgb = np.empty((target_height, target_width, 3), dtype=np.uint8)
+
+    def process(self, frame: np.ndarray) -> np.ndarray:
+        """Return the RGB frame to feed to the pose model.
+
+        The returned array is overwritten by the next call.
+        """
+        if frame.shape != self._source_shape:
+            self._allocate(frame)
+
+        if self._target_size is not None:
+            # INTER_AREA avoids aliasing when shrinking
+            cv2.resize(frame, self._target_size, dst=self._resized, interpolation=cv2.INTER_AREA)
+            frame = self._resized
+
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return self._rgb
@@ -0,0 +1,79 @@
+import os
+from typing import Optional
+
+SAMPLING_MODES = ("full", "fixed", "adaptive")
+DEFAULT_SAMPLING_MODE = os.getenv("FORM_ANALYSIS_SAMPLING", "adaptive")
+DEFAULT_TARGET_FPS = float(os.getenv("FORM_ANALYSIS_TARGET_FPS", 10))
+
+# Adaptive mode samples this many times faster near the bottom of a rep
+DENSE_FACTOR = 3
+# Fraction of the observed angle range treated as "near the minimum"
+EXTREME_BAND = 0.3
+# Minimum angle range (degrees) before the movement is considered established
+MIN_RANGE = 15.0
+
+
+class FrameSampler:
+    """Decide which decoded frames get pose inference.
+
+    ``full`` processes every frame, ``fixed`` processes frames at
+    ``target_fps`` and ``adaptive`` additionally samples densely while the
+    key joint angle is near the minima used for rep detection.
+    """
+
+    def __init__(
+        self,
+        source_fps: float,
+        mode: Optional[str] = None,
+        target_fps: Optional[float] = None
+    ):
+        self.mode = mode or DEFAULT_SAMPLING_MODE
+        if self.mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {self.mode}")
+
+        self.source_fps = source_fps
+        target_fps = min(target_fps or DEFAULT_TARGET_FPS, source_fps)
+
+        if self.mode == "full":
+            self.base_stride = 1
+        else:
+            self.base_stride = max(1, round(source_fps / target_fps))
+        # Keep dense positions on the base grid, so a dense stretch adds
+        # frames between the regular ones instead of shifting them
+        self.dense_stride = max(1, self.base_stride // DENSE_FACTOR)
+        while self.base_stride % self.dense_stride:
+            self.dense_stride -= 1
+
+        self.processed = 0
+        self._next_frame = 0
+        self._low = None
+        self._high = None
+
+    def should_process(self, frame_index: int) -> bool:
+        return frame_index >= self._next_frame
+
+    def observe(self, frame_index: int, key_angle: Optional[float] = None) -> int:
+        """Record a processed frame and return how many source frames it stands for"""
+        self.processed += 1
+        stride = self.base_stride
+
+        if self.mode == "adaptive" and key_angle is not None:
+            self._low = key_angle if self._low is None else min(self._low, key_angle)
+            self._high = key_angle if self._high is None else max(self._high, key_angle)
+
+            movement_range = self._high - self._low
+            if movement_range >= MIN_RANGE and key_angle <= self._low + movement_range * EXTREME_BAND:
+                stride = self.dense_stride
+
+        next_frame = frame_index + stride
+        if stride == self.base_stride:
+            # Back on the base grid after a dense stretch, so regular frames never shift
+            next_frame -= next_frame % self.base_stride
+        self._next_frame = next_frame
+        return next_frame - frame_index
+
+    def effective_fps(self, frames_seen: int) -> float:
+        """Average number of analyzed frames per second of video"""
+        if frames_seen <= 0:
+            return 0.0
+        return self.processed * self.source_fps / frames_seen
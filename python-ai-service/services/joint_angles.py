@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+
+from services.pose_track import (
+    X, Y, VISIBILITY,
+    LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+    LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE
+)
+
+# Joint angles as (first, vertex, last) landmark indices; the angle is measured at the vertex
+JOINT_ANGLES = {
+    'left_elbow': (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    'right_elbow': (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    'left_knee': (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    'right_knee': (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    'left_hip': (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+    'right_hip': (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE),
+    'left_shoulder': (LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP),
+    'right_shoulder': (RIGHT_ELBOW, RIGHT_SHOULDER, RIGHT_HIP)
+}
+JOINT_NAMES = list(JOINT_ANGLES)
+JOINT_INDEX = {name: i for i, name in enumerate(JOINT_NAMES)}
+JOINT_TRIPLETS = np.array(list(JOINT_ANGLES.values()), dtype=np.intp)
+
+# Landmarks MediaPipe is less sure about than this are treated as missing
+MIN_VISIBILITY = float(os.getenv("FORM_ANALYSIS_MIN_VISIBILITY", 0.5))
+
+
+def compute_joint_angles(
+    landmarks: np.ndarray,
+    triplets: np.ndarray = JOINT_TRIPLETS,
+    min_visibility: float = MIN_VISIBILITY
+) -> np.ndarray:
+    """Compute 2D joint angles in degrees for a whole pose track at once.
+
+    ``landmarks`` is a ``(frames, 33, 4)`` array and ``triplets`` a
+    ``(joints, 3)`` table of landmark indices. Returns a ``(frames, joints)``
+    float32 array; joints with a low-visibility or degenerate landmark are NaN.
+    """
+    points = landmarks[:, triplets, :]
+    xy = points[..., [X, Y]].astype(np.float64)
+
+    v1 = xy[:, :, 0] - xy[:, :, 1]
+    v2 = xy[:, :, 2] - xy[:, :, 1]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos_angle = (v1 * v2).sum(axis=-1) / (
+            np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1)
+        )
+    angles = np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0)))
+
+    visible = points[..., VISIBILITY].min(axis=-1) >= min_visibility
+    angles[~visible] = np.nan
+
+    return angles.astype(np.float32)
+
+
+def bilateral_mean(angles: np.ndarray, joints, default: float) -> np.ndarray:
+    """Per-frame mean of the given joint columns, ignoring NaN.
+
+    Falls back to ``default`` for frames where every joint is missing, so a
+    side occluded in profile shots does not drag the average.
+    """
+    columns = angles[:, [JOINT_INDEX[joint] for joint in joints]]
+    present = ~np.isnan(columns)
+    counts = present.sum(axis=1)
+    totals = np.where(present, columns, 0).sum(axis=1)
+    return np.where(counts > 0, totals / np.maximum(counts, 1), default)
@@ -0,0 +1,159 @@
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from services.frame_preprocessing import FramePreprocessor
+from services.joint_angles import compute_joint_angles
+from services.pose_track import NUM_LANDMARKS
+from services.rep_detection import RepDetector
+
+LIVE_POSE_TIER = os.getenv("FORM_LIVE_TIER", "fast")
+LIVE_MAX_LONG_EDGE = int(os.getenv("FORM_LIVE_MAX_LONG_EDGE", 480))
+
+
+class LiveFormSession:
+    """Per-connection state for real-time form analysis.
+
+    Frames arrive either as encoded images (pose inference runs here) or as
+    client-side landmarks. Each frame is scored with the same vectorized
+    checkpoint rules as uploaded videos, on a one-row track.
+    """
+
+    def __init__(self, form_analyzer, exercise_name: str, tier: Optional[str] = None):
+        self.form_analyzer = form_analyzer
+        self.exercise_name = exercise_name
+        self.tier = tier or LIVE_POSE_TIER
+        self.rep_detector = RepDetector()
+        self.frames = 0
+        self.pose_frames = 0
+        self._pose = None
+        self._preprocessor = FramePreprocessor(LIVE_MAX_LONG_EDGE)
+        self._landmarks = np.zeros((1, NUM_LANDMARKS, 4), dtype=np.float32)
+        self._checkpoint_names: List[str] = []
+        self._score_totals = None
+        self._started = time.monotonic()
+
+    def _timestamp(self, timestamp: Optional[float]) -> float:
+        if timestamp is None:
+            return time.monotonic() - self._started
+        try:
+            timestamp = float(timestamp)
+        except (TypeError, ValueError):
+            raise ValueError("timestamp must be a number of seconds")
+        if not np.isfinite(timestamp):
+            raise ValueError("timestamp must be a number of seconds")
+        return timestamp
+
+    def process_image(self, data: bytes, timestamp: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Run pose inference on an encoded (e.g. JPEG) frame and score it"""
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Could not decode frame")
+
+        if self._pose is None:
+            # Tracking state is per stream, so every session owns its Pose
+            self._pose = self.form_analyzer.create_pose(self.tier)
+
+        results = self._pose.process(self._preprocessor.process(frame))
+        if not results.pose_landmarks:
+            return self._emit(self._timestamp(timestamp), None)
+
+        for i, landmark in enumerate(results.pose_landmarks.landmark[:NUM_LANDMARKS]):
+            self._landmarks[0, i] = (landmark.x, landmark.y, landmark.z, landmark.visibility)
+        return self._emit(self._timestamp(timestamp), self._landmarks)
+
+    def process_landmarks(self, landmarks: List[Any], timestamp: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Score a frame of client-side landmarks.
+
+        Takes 33 [x, y, z, visibility] rows or, as MediaPipe's JavaScript API
+        produces them, {x, y, z, visibility} objects. Anything else raises
+        ValueError.
+        """
+        if not isinstance(landmarks, list):
+            raise ValueError(f"Expected a list of {NUM_LANDMARKS} landmarks")
+        rows = [
+            [landmark.get("x"), landmark.get("y"), landmark.get("z"), landmark.get("visibility", 1.0)]
+            if isinstance(landmark, dict) else landmark
+            for landmark in landmarks
+        ]
+        try:
+            row = np.asarray(rows, dtype=np.float32)
+        except (TypeError, ValueError):
+            raise ValueError("Landmark coordinates must be numbers")
+        if row.shape == (NUM_LANDMARKS, 3):
+            # Visibility is optional; treat missing values as fully visible
+            row = np.concatenate([row, np.ones((NUM_LANDMARKS, 1), dtype=np.float32)], axis=1)
+        if row.shape != (NUM_LANDMARKS, 4):
+            raise ValueError(f"Expected {NUM_LANDMARKS} landmarks with 3 or 4 values each")
+        # None and missing coordinates convert to NaN rather than failing
+        if not np.isfinite(row).all():
+            raise ValueError("Landmark coordinates must be numbers")
+
+        timestamp = self._timestamp(timestamp)
+        self._landmarks[0] = row
+        return self._emit(timestamp, self._landmarks)
+
+    def _emit(self, timestamp: float, landmarks: Optional[np.ndarray]) -> List[Dict[str, Any]]:
+        """Score one frame and build the messages to send back"""
+        self.frames += 1
+        if landmarks is None:
+            return [{"type": "frame", "timestamp": timestamp, "pose_detected": False}]
+
+        self.pose_frames += 1
+        angles = compute_joint_angles(landmarks)
+        names, scores = self.form_analyzer.score_checkpoints(landmarks, angles, self.exercise_name)
+
+        if self._score_totals is None:
+            self._checkpoint_names = names
+            self._score_totals = np.zeros(len(names), dtype=np.float64)
+        self._score_totals += scores[0]
+
+        frame_scores = {name: round(float(score), 1) for name, score in zip(names, scores[0])}
+        messages = [{
+            "type": "frame",
+            "timestamp": timestamp,
+            "pose_detected": True,
+            "scores": frame_scores,
+            "form_score": round(float(scores[0].mean()), 1),
+            "rep_count": self.rep_detector.count
+        }]
+
+        key_angles = self.form_analyzer.key_angle_series(angles, self.exercise_name, default=np.nan)
+        if key_angles is not None:
+            rep = self.rep_detector.update(self.frames - 1, timestamp, float(key_angles[0]))
+            if rep is not None:
+                messages[0]["rep_count"] = self.rep_detector.count
+                messages.append({
+                    "type": "rep",
+                    "rep_count": self.rep_detector.count,
+                    "start_time": rep["start_time"],
+                    "bottom_time": rep["bottom_time"],
+                    "timestamp": rep["end_time"]
+                })
+
+        return messages
+
+    def summary(self) -> Dict[str, Any]:
+        """Session totals sent when the client closes the stream"""
+        average_scores = {}
+        if self._score_totals is not None:
+            average_scores = {
+                name: round(float(total / self.pose_frames), 1)
+                for name, total in zip(self._checkpoint_names, self._score_totals)
+            }
+
+        return {
+            "type": "summary",
+            "frames": self.frames,
+            "pose_frames": self.pose_frames,
+            "rep_count": self.rep_detector.count,
+            "average_scores": average_scores
+        }
+
+    def close(self):
+        if self._pose is not None:
+            self._pose.close()
+            self._pose = None
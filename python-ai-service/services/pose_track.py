@@ -0,0 +1,161 @@
+import io
+import json
+from typing import Dict, Any
+
+import numpy as np
+
+LANDMARK_NAMES = [
+    'nose', 'left_eye_inner', 'left_eye', 'left_eye_outer',
+    'right_eye_inner', 'right_eye', 'right_eye_outer',
+    'left_ear', 'right_ear', 'mouth_left', 'mouth_right',
+    'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
+    'left_wrist', 'right_wrist', 'left_pinky', 'right_pinky',
+    'left_index', 'right_index', 'left_thumb', 'right_thumb',
+    'left_hip', 'right_hip', 'left_knee', 'right_knee',
+    'left_ankle', 'right_ankle', 'left_heel', 'right_heel',
+    'left_foot_index', 'right_foot_index'
+]
+LANDMARK_INDEX = {name: i for i, name in enumerate(LANDMARK_NAMES)}
+NUM_LANDMARKS = len(LANDMARK_NAMES)
+
+# Index constants for named landmark access
+NOSE = LANDMARK_INDEX['nose']
+LEFT_SHOULDER = LANDMARK_INDEX['left_shoulder']
+RIGHT_SHOULDER = LANDMARK_INDEX['right_shoulder']
+LEFT_ELBOW = LANDMARK_INDEX['left_elbow']
+RIGHT_ELBOW = LANDMARK_INDEX['right_elbow']
+LEFT_WRIST = LANDMARK_INDEX['left_wrist']
+RIGHT_WRIST = LANDMARK_INDEX['right_wrist']
+LEFT_HIP = LANDMARK_INDEX['left_hip']
+RIGHT_HIP = LANDMARK_INDEX['right_hip']
+LEFT_KNEE = LANDMARK_INDEX['left_knee']
+RIGHT_KNEE = LANDMARK_INDEX['right_knee']
+LEFT_ANKLE = LANDMARK_INDEX['left_ankle']
+RIGHT_ANKLE = LANDMARK_INDEX['right_ankle']
+
+# Channel layout of the last landmark axis
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+
+
+class PoseTrack:
+    """Columnar store for a video's pose landmarks.
+
+    ``landmarks`` is a ``(frames, 33, 4)`` float32 array of x, y, z and
+    visibility, with matching per-frame timestamps, source frame indices and
+    sampling weights (how many source frames each analyzed frame stands for).
+    Storage is preallocated and grows geometrically when exceeded.
+    ``metadata`` carries JSON-serializable facts about how the track was made.
+    """
+
+    def __init__(self, capacity: int = 256):
+        capacity = max(1, int(capacity))
+        self.metadata: Dict[str, Any] = {}
+        self._landmarks = np.empty((capacity, NUM_LANDMARKS, 4), dtype=np.float32)
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._frame_indices = np.empty(capacity, dtype=np.int32)
+        self._weights = np.empty(capacity, dtype=np.float32)
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def landmarks(self) -> np.ndarray:
+        return self._landmarks[:self._length]
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps[:self._length]
+
+    @property
+    def frame_indices(self) -> np.ndarray:
+        return self._frame_indices[:self._length]
+
+    @property
+    def weights(self) -> np.ndarray:
+        return self._weights[:self._length]
+
+    @property
+    def duration(self) -> float:
+        if self._length == 0:
+            return 0.0
+        return float(self._timestamps[self._length - 1] - self._timestamps[0])
+
+    def _grow(self):
+        capacity = self._landmarks.shape[0] * 2
+        self._landmarks = np.resize(self._landmarks, (capacity, NUM_LANDMARKS, 4))
+        self._timestamps = np.resize(self._timestamps, capacity)
+        self._frame_indices = np.resize(self._frame_indices, capacity)
+        self._weights = np.resize(self._weights, capacity)
+
+    def append(self, frame_index: int, timestamp: float, pose_landmarks, weight: float = 1) -> np.ndarray:
+        """Copy a MediaPipe landmark list into the next row and return that row"""
+        if self._length == self._landmarks.shape[0]:
+            self._grow()
+
+        row = self._landmarks[self._length]
+        for i, landmark in enumerate(pose_landmarks.landmark[:NUM_LANDMARKS]):
+            row[i] = (landmark.x, landmark.y, landmark.z, landmark.visibility)
+
+        self._timestamps[self._length] = timestamp
+        self._frame_indices[self._length] = frame_index
+        self._weights[self._length] = weight
+        self._length += 1
+        return row
+
+    def set_last_weight(self, weight: float):
+        self._weights[self._length - 1] = weight
+
+    def to_bytes(self) -> bytes:
+        """Serialize the filled part of the track as a compressed npz blob"""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            landmarks=self.landmarks,
+            timestamps=self.timestamps,
+            frame_indices=self.frame_indices,
+            weights=self.weights,
+            metadata=np.frombuffer(json.dumps(self.metadata).encode(), dtype=np.uint8)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_landmark_array(cls, data: bytes, fps: float, dtype=np.float16) -> 'PoseTrack':
+        """Build a track from client-side landmarks.
+
+        ``data`` is a raw little-endian ``(frames, 33, 4)`` array of x, y, z
+        and visibility sampled at a constant ``fps``. Non-finite landmarks are
+        treated as not visible.
+        """
+        dtype = np.dtype(dtype).newbyteorder('<')
+        row_bytes = NUM_LANDMARKS * 4 * dtype.itemsize
+        if fps <= 0:
+            raise ValueError("fps must be positive")
+        if not data or len(data) % row_bytes:
+            raise ValueError(f"Landmark data must be a whole number of {row_bytes}-byte frames")
+
+        landmarks = np.frombuffer(data, dtype=dtype).reshape(-1, NUM_LANDMARKS, 4)
+        length = landmarks.shape[0]
+        track = cls(capacity=length)
+        track._landmarks[:length] = landmarks
+
+        missing = ~np.isfinite(track._landmarks[:length]).all(axis=2)
+        track._landmarks[:length][missing] = 0.0
+        track._timestamps[:length] = np.arange(length) / fps
+        track._frame_indices[:length] = np.arange(length)
+        track._weights[:length] = 1.0
+        track._length = length
+        return track
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'PoseTrack':
+        with np.load(io.BytesIO(data)) as arrays:
+            length = len(arrays['timestamps'])
+            track = cls(capacity=length)
+            track._landmarks[:length] = arrays['landmarks']
+            track._timestamps[:length] = arrays['timestamps']
+            track._frame_indices[:length] = arrays['frame_indices']
+            track._weights[:length] = arrays['weights']
+            track.metadata = json.loads(arrays['metadata'].tobytes().decode())
+        track._length = length
+        return track
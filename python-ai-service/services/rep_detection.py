@@ -0,0 +1,161 @@
+import os
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Trailing window of the running-mean filter applied to the key angle
+SMOOTHING_SECONDS = float(os.getenv("FORM_REP_SMOOTHING_SECONDS", 0.2))
+# Swing (degrees) the smoothed angle must make before a turn is trusted
+HYSTERESIS_DEGREES = float(os.getenv("FORM_REP_HYSTERESIS_DEGREES", 15))
+# Reps shorter than this, from start to completion, are treated as jitter
+MIN_REP_SECONDS = float(os.getenv("FORM_REP_MIN_SECONDS", 0.5))
+# Fraction of the descent that must be recovered before a rep counts
+RECOVERY_FRACTION = 0.7
+
+
+def smooth_angles(timestamps: np.ndarray, angles: np.ndarray, window: float = SMOOTHING_SECONDS) -> np.ndarray:
+    """Causal running mean over the trailing ``window`` seconds.
+
+    Uses cumulative sums, so the whole series is filtered in O(n) with no
+    per-sample slices; works with the irregular timestamps of adaptive
+    sampling. Matches what ``RepDetector.update`` computes sample by sample.
+    """
+    sums = np.concatenate(([0.0], np.cumsum(angles, dtype=np.float64)))
+    first = np.searchsorted(timestamps, timestamps - window, side='right')
+    # The window always holds at least the current sample
+    first = np.minimum(first, np.arange(len(angles)))
+    last = np.arange(1, len(angles) + 1)
+    return (sums[last] - sums[first]) / (last - first)
+
+
+class RepDetector:
+    """Hysteresis state machine that finds reps in a key joint angle.
+
+    A rep runs from a top (extended position) down to a bottom and back up.
+    Turning points only count once the smoothed angle has moved
+    ``hysteresis`` degrees away from them, so noise around an extreme
+    cannot split a rep, and a rep is counted once the ascent recovers
+    ``RECOVERY_FRACTION`` of the descent. Each rep is reported as
+    ``start``/``bottom``/``end`` sample indices with matching times; ``end``
+    keeps moving to the highest point reached until the next descent starts.
+
+    Feed samples one at a time with ``update`` (O(1) each, for live
+    streams) or a whole series at once with ``detect_reps``.
+    """
+
+    def __init__(
+        self,
+        hysteresis: float = HYSTERESIS_DEGREES,
+        min_rep_seconds: float = MIN_REP_SECONDS,
+        smoothing_seconds: float = SMOOTHING_SECONDS
+    ):
+        self.hysteresis = hysteresis
+        self.min_rep_seconds = min_rep_seconds
+        self.smoothing_seconds = smoothing_seconds
+        self.reps: List[Dict[str, Any]] = []
+
+        self._window = deque()
+        self._window_sum = 0.0
+        self._phase = "top"
+        self._top = None
+        self._bottom = None
+        self._peak = None
+        self._open_rep = None
+
+    @property
+    def count(self) -> int:
+        return len(self.reps)
+
+    def update(self, index: int, timestamp: float, angle: float) -> Optional[Dict[str, Any]]:
+        """Add a raw key-angle sample; return the rep it completes, if any"""
+        if not np.isfinite(angle):
+            return None
+
+        self._window.append((timestamp, angle))
+        self._window_sum += angle
+        # Same comparison as smooth_angles, so samples exactly on the window edge agree
+        window_start = timestamp - self.smoothing_seconds
+        while self._window[0][0] <= window_start and len(self._window) > 1:
+            self._window_sum -= self._window.popleft()[1]
+
+        return self._step(index, timestamp, self._window_sum / len(self._window))
+
+    def _step(self, index: int, timestamp: float, value: float) -> Optional[Dict[str, Any]]:
+        """Advance the state machine by one smoothed sample"""
+        point = (index, timestamp, value)
+
+        if self._phase == "top":
+            if self._top is None or value >= self._top[2]:
+                self._top = point
+                if self._open_rep is not None:
+                    self._set_end(self._open_rep, point)
+            elif value < self._top[2] - self.hysteresis:
+                self._phase = "down"
+                self._bottom = point
+                self._open_rep = None
+
+        elif self._phase == "down":
+            if value <= self._bottom[2]:
+                self._bottom = point
+            elif value > self._bottom[2] + self.hysteresis:
+                self._phase = "up"
+                self._peak = point
+
+        if self._phase == "up":
+            if value >= self._peak[2]:
+                self._peak = point
+
+            depth = self._top[2] - self._bottom[2]
+            if value >= self._bottom[2] + RECOVERY_FRACTION * depth:
+                return self._complete(point)
+
+            if value < self._peak[2] - self.hysteresis:
+                # Partial ascent followed by another descent: restart from its peak
+                self._top = self._peak
+                self._bottom = point
+                self._phase = "down"
+
+        return None
+
+    def _complete(self, point) -> Optional[Dict[str, Any]]:
+        start = self._top
+        self._phase = "top"
+        self._top = point
+        self._open_rep = None
+
+        if point[1] - start[1] < self.min_rep_seconds:
+            return None
+
+        rep = {
+            "start": start[0],
+            "bottom": self._bottom[0],
+            "start_time": start[1],
+            "bottom_time": self._bottom[1]
+        }
+        self._set_end(rep, point)
+        self.reps.append(rep)
+        self._open_rep = rep
+        return rep
+
+    @staticmethod
+    def _set_end(rep: Dict[str, Any], point):
+        rep["end"] = point[0]
+        rep["end_time"] = point[1]
+
+    def detect_reps(self, timestamps: np.ndarray, angles: np.ndarray) -> List[Dict[str, Any]]:
+        """Find every rep in a whole key-angle series.
+
+        Missing (NaN) samples are skipped; returned indices refer to positions
+        in the input arrays.
+        """
+        valid = np.flatnonzero(np.isfinite(angles))
+        if not len(valid):
+            return self.reps
+
+        times = np.asarray(timestamps, dtype=np.float64)[valid]
+        smoothed = smooth_angles(times, np.asarray(angles, dtype=np.float64)[valid], self.smoothing_seconds)
+
+        for index, timestamp, value in zip(valid.tolist(), times.tolist(), smoothed.tolist()):
+            self._step(index, timestamp, value)
+        return self.reps
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - redis is optional at runtime
+    aioredis = None
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable short hash of JSON-serializable key parts"""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class AnalysisCache:
+    """Two-tier cache: a bounded in-process LRU in front of an optional Redis.
+
+    Values are kept as Python objects in the LRU and serialized with
+    ``dumps``/``loads`` for Redis so replicas can share them. Redis failures
+    are logged and treated as misses; they never fail the request.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 256,
+        ttl: Optional[int] = None,
+        redis_url: Optional[str] = None,
+        dumps: Callable[[Any], bytes] = lambda value: json.dumps(value).encode(),
+        loads: Callable[[bytes], Any] = lambda data: json.loads(data)
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._dumps = dumps
+        self._loads = loads
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._redis = aioredis.from_url(redis_url) if redis_url and aioredis else None
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _remember(self, key: str, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        if self._redis is not None:
+            try:
+                data = await self._redis.get(self._redis_key(key))
+            except Exception as e:
+                print(f"Error reading {self.namespace} cache from Redis: {e}")
+                data = None
+
+            if data is not None:
+                value = self._loads(data)
+                self._remember(key, value)
+                self.hits += 1
+                self.redis_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        if self.max_entries > 0:
+            self._remember(key, value)
+
+        if self._redis is not None:
+            try:
+                await self._redis.set(self._redis_key(key), self._dumps(value), ex=self.ttl)
+            except Exception as e:
+                print(f"Error writing {self.namespace} cache to Redis: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "redis": self._redis is not None
+        }
+
+
+def _load_track(data: bytes):
+    # Imported on first use so building the caches does not load NumPy
+    from services.pose_track import PoseTrack
+    return PoseTrack.from_bytes(data)
+
+
+def create_form_analysis_caches() -> Dict[str, Optional[AnalysisCache]]:
+    """Build the result and pose-track caches from environment settings"""
+    redis_url = os.getenv("FORM_ANALYSIS_CACHE_REDIS_URL", os.getenv("REDIS_URL"))
+    ttl = int(os.getenv("FORM_ANALYSIS_CACHE_TTL", 24 * 3600))
+
+    result_cache = AnalysisCache(
+        "form:result",
+        max_entries=int(os.getenv("FORM_ANALYSIS_CACHE_SIZE", 256)),
+        ttl=ttl,
+        redis_url=redis_url
+    )
+
+    track_cache = None
+    if os.getenv("FORM_ANALYSIS_CACHE_TRACKS", "true").lower() == "true":
+        track_cache = AnalysisCache(
+            "form:track",
+            max_entries=int(os.getenv("FORM_ANALYSIS_TRACK_CACHE_SIZE", 32)),
+            ttl=ttl,
+            redis_url=redis_url,
+            dumps=lambda track: track.to_bytes(),
+            loads=_load_track
+        )
+
+    return {"result_cache": result_cache, "track_cache": track_cache}
+
+
+def create_workout_cache() -> Optional[AnalysisCache]:
+    """Cache for seeded workout generation; WORKOUT_CACHE_SIZE=0 without Redis disables it"""
+    redis_url = os.getenv("WORKOUT_CACHE_REDIS_URL", os.getenv("REDIS_URL"))
+    max_entries = int(os.getenv("WORKOUT_CACHE_SIZE", 1024))
+    if max_entries <= 0 and not redis_url:
+        return None
+
+    return AnalysisCache(
+        "workout:result",
+        max_entries=max_entries,
+        ttl=int(os.getenv("WORKOUT_CACHE_TTL", 24 * 3600)),
+        redis_url=redis_url
+    )
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Services to build at startup instead of on first use: a comma-separated
+# list of names, "all", or empty to build everything lazily
+WARMUP_SERVICES = os.getenv("AI_SERVICE_WARMUP", "")
+
+
+class ServiceRegistry:
+    """Services constructed on first use instead of at import time.
+
+    Each service is registered with a factory that does its own heavy
+    imports, so the app starts serving without loading MediaPipe, OpenCV or
+    model weights it may never need. Factories run on a worker thread to
+    keep the event loop responsive, and concurrent first requests share one
+    construction. A failed construction is retried on the next request.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[..., Any]] = {}
+        self._requires: Dict[str, List[str]] = {}
+        self._services: Dict[str, Any] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._errors: Dict[str, str] = {}
+        self._load_seconds: Dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[..., Any], requires: Iterable[str] = ()):
+        """Add a service; its factory is called with the ``requires`` services as arguments"""
+        self._factories[name] = factory
+        self._requires[name] = list(requires)
+
+    def loaded(self, name: str) -> Optional[Any]:
+        """The service if it has been built, without building it"""
+        return self._services.get(name)
+
+    async def get(self, name: str) -> Any:
+        if name in self._services:
+            return self._services[name]
+
+        if name not in self._loading:
+            self._loading[name] = asyncio.ensure_future(self._build(name))
+        # Shield so one cancelled request does not abort a shared construction
+        return await asyncio.shield(self._loading[name])
+
+    async def _build(self, name: str) -> Any:
+        try:
+            dependencies = [await self.get(dependency) for dependency in self._requires[name]]
+
+            started = time.monotonic()
+            loop = asyncio.get_running_loop()
+            service = await loop.run_in_executor(None, self._factories[name], *dependencies)
+        except Exception as e:
+            self._errors[name] = str(e)
+            print(f"Error initializing {name}: {e}")
+            raise
+        finally:
+            del self._loading[name]
+
+        self._services[name] = service
+        self._errors.pop(name, None)
+        self._load_seconds[name] = round(time.monotonic() - started, 2)
+        return service
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Build services ahead of traffic; failures are recorded, not raised"""
+        names = list(self._factories) if names is None else list(names)
+        await asyncio.gather(*(self.get(name) for name in names), return_exceptions=True)
+
+    def warmup_names(self, setting: str = WARMUP_SERVICES) -> List[str]:
+        """Parse the AI_SERVICE_WARMUP setting into registered service names"""
+        if setting.strip() == "all":
+            return list(self._factories)
+        names = [name.strip() for name in setting.split(",") if name.strip()]
+        unknown = [name for name in names if name not in self._factories]
+        if unknown:
+            raise ValueError(f"Unknown services in AI_SERVICE_WARMUP: {', '.join(unknown)}")
+        return names
+
+    def status(self) -> Dict[str, str]:
+        """Readiness of every service: ready, loading, failed or not_loaded"""
+        status = {}
+        for name in self._factories:
+            if name in self._services:
+                status[name] = "ready"
+            elif name in self._loading:
+                status[name] = "loading"
+            elif name in self._errors:
+                status[name] = "failed"
+            else:
+                status[name] = "not_loaded"
+        return status
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "load_seconds": dict(self._load_seconds),
+            "errors": dict(self._errors)
+        }
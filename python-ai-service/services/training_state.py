@@ -0,0 +1,336 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import WatchError
+except ImportError:  # pragma: no cover - redis is optional at runtime
+    aioredis = None
+
+from services.user_history import DEFAULT_RATING, RECENT_DAYS, UserHistory, days_since, top_exercises
+
+TRAINING_STATE_TTL = int(os.getenv("TRAINING_STATE_TTL", 30 * 24 * 3600))
+MAX_TRAINING_STATES = int(os.getenv("TRAINING_STATE_MAX_USERS", 100000))
+# Workout ids remembered so a retried completion is not counted twice
+RECORDED_IDS = 50
+PROGRESSION_RATINGS = 3
+
+
+def _compact_workout(workout: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a workout that fatigue and recovery read"""
+    return {
+        "completedAt": workout.get("completedAt", ""),
+        "difficulty": workout.get("difficulty"),
+        "exercises": [
+            {"target_muscles": exercise.get("target_muscles", [])}
+            for exercise in workout.get("exercises", [])
+        ]
+    }
+
+
+class TrainingState:
+    """What workout generation needs to know about a user, kept up to date incrementally.
+
+    Holds the workout count, summed ratings per exercise (in first-seen
+    order), the last few ratings, and only the workouts still inside the
+    recent window for fatigue and recovery, so its size and the cost of
+    ``analysis`` do not grow with history. Recording workouts in history
+    order gives exactly the analysis of the full history.
+    """
+
+    def __init__(
+        self,
+        workout_count: int = 0,
+        exercise_scores: Optional[Dict[str, float]] = None,
+        last_ratings: Optional[List[float]] = None,
+        recent_workouts: Optional[List[Dict[str, Any]]] = None,
+        recorded_ids: Optional[List[str]] = None,
+        updated_at: Optional[float] = None
+    ):
+        self.workout_count = workout_count
+        self.exercise_scores = exercise_scores or {}
+        self.last_ratings = last_ratings or []
+        self.recent_workouts = recent_workouts or []
+        self.recorded_ids = recorded_ids or []
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_history(cls, history: List[Dict[str, Any]], now: Optional[datetime] = None) -> "TrainingState":
+        """Seed the state from a full history payload in one vectorized pass"""
+        columns = UserHistory(history, now)
+        return cls(
+            workout_count=len(columns),
+            exercise_scores=columns.exercise_scores(),
+            last_ratings=columns.ratings[-PROGRESSION_RATINGS:].tolist(),
+            recent_workouts=[_compact_workout(history[position]) for position in columns.recent.tolist()],
+            recorded_ids=[
+                str(workout_id) for workout_id in
+                (workout.get("id") or workout.get("_id") for workout in history[-RECORDED_IDS:])
+                if workout_id is not None
+            ],
+            updated_at=time.time()
+        )
+
+    def record(self, workout: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+        """Fold one completed workout into the state; False if it was already recorded"""
+        now = now or datetime.now()
+        workout_id = workout.get("id") or workout.get("_id")
+        if workout_id is not None:
+            if str(workout_id) in self.recorded_ids:
+                return False
+            self.recorded_ids = (self.recorded_ids + [str(workout_id)])[-RECORDED_IDS:]
+
+        rating = float(workout.get("rating", DEFAULT_RATING))
+        self.workout_count += 1
+        self.last_ratings = (self.last_ratings + [rating])[-PROGRESSION_RATINGS:]
+        for exercise in workout.get("exercises", []):
+            name = exercise.get("name", "")
+            if name:
+                self.exercise_scores[name] = self.exercise_scores.get(name, 0.0) + rating
+
+        # Workouts only age, so one outside the window now never becomes recent
+        if days_since(workout.get("completedAt", ""), now) <= RECENT_DAYS:
+            self.recent_workouts.append(_compact_workout(workout))
+        self._expire_recent(now)
+
+        self.updated_at = time.time()
+        return True
+
+    def record_planned(self, workout: Dict[str, Any], now: Optional[datetime] = None):
+        """Count a planned session toward fatigue and recovery only; it has no rating yet"""
+        now = now or datetime.now()
+        if days_since(workout.get("completedAt", ""), now) <= RECENT_DAYS:
+            self.recent_workouts.append(_compact_workout(workout))
+        self._expire_recent(now)
+
+    def _expire_recent(self, now: datetime):
+        self.recent_workouts = [
+            workout for workout in self.recent_workouts
+            if days_since(workout["completedAt"], now) <= RECENT_DAYS
+        ]
+
+    def analysis(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """The same analysis WorkoutGenerator derives from the full history"""
+        if not self.workout_count and not self.recent_workouts:
+            return {
+                "muscle_fatigue": {},
+                "preferred_exercises": [],
+                "recovery_needed": False,
+                "progression_ready": True
+            }
+
+        recent = UserHistory(self.recent_workouts, now)
+
+        return {
+            "muscle_fatigue": recent.muscle_fatigue(),
+            "preferred_exercises": top_exercises(self.exercise_scores),
+            "recovery_needed": recent.recovery_needed(),
+            # Planned sessions alone leave a new user as ready as no history does
+            "progression_ready": not self.workout_count or (
+                self.workout_count >= PROGRESSION_RATINGS
+                and sum(self.last_ratings) / PROGRESSION_RATINGS >= 4.0
+            ),
+            "workout_frequency": recent.recent_count
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "workout_count": self.workout_count,
+            "exercises_rated": len(self.exercise_scores),
+            "recent_workouts": len(self.recent_workouts),
+            "updated_at": self.updated_at
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "workout_count": self.workout_count,
+            # Pairs rather than an object so first-seen order survives any JSON store
+            "exercise_scores": list(self.exercise_scores.items()),
+            "last_ratings": self.last_ratings,
+            "recent_workouts": self.recent_workouts,
+            "recorded_ids": self.recorded_ids,
+            "updated_at": self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TrainingState":
+        return cls(
+            workout_count=data["workout_count"],
+            exercise_scores=dict(data["exercise_scores"]),
+            last_ratings=data["last_ratings"],
+            recent_workouts=data["recent_workouts"],
+            recorded_ids=data["recorded_ids"],
+            updated_at=data["updated_at"]
+        )
+
+
+class TrainingStateStore(ABC):
+    """Per-user training states; backends implement ``get``, ``save`` and ``delete``"""
+
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[TrainingState]:
+        ...
+
+    @abstractmethod
+    async def save(self, user_id: str, state: TrainingState):
+        ...
+
+    @abstractmethod
+    async def delete(self, user_id: str):
+        ...
+
+    async def load(
+        self, user_id: str, history: List[Dict[str, Any]]
+    ) -> Tuple[Optional[TrainingState], str]:
+        """The user's state and whether it was a ``hit``, ``seeded`` from history or a ``miss``.
+
+        A missing state is only seeded from a non-empty history: an empty one
+        may just mean the caller relied on a state that has since expired.
+        """
+        state = await self.get(user_id)
+        if state is not None:
+            return state, "hit"
+        if not history:
+            return None, "miss"
+
+        state = TrainingState.from_history(history)
+        await self.save(user_id, state)
+        return state, "seeded"
+
+    async def record(self, user_id: str, workout: Dict[str, Any]) -> Optional[TrainingState]:
+        """Add a completed workout to an existing state; None if the user has none.
+
+        Reads, updates and writes back with no lock, which is safe within one
+        process; backends shared between processes override it atomically.
+        """
+        state = await self.get(user_id)
+        if state is None:
+            return None
+        if state.record(workout):
+            await self.save(user_id, state)
+        return state
+
+
+class InMemoryTrainingStateStore(TrainingStateStore):
+    """States kept in this process; least recently used users beyond ``max_users`` and
+    states not updated for ``ttl`` seconds are evicted.
+
+    Every worker process has its own store, so with several uvicorn workers
+    a user's completions land in whichever worker served them and the
+    others generate from stale state. Multi-worker deployments need the
+    redis backend; ``create_training_state_store`` refuses this one there.
+    """
+
+    def __init__(self, ttl: int = TRAINING_STATE_TTL, max_users: int = MAX_TRAINING_STATES):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._states: "OrderedDict[str, TrainingState]" = OrderedDict()
+
+    async def get(self, user_id: str) -> Optional[TrainingState]:
+        state = self._states.get(user_id)
+        if state is None:
+            return None
+        if time.time() - state.updated_at > self.ttl:
+            del self._states[user_id]
+            return None
+        self._states.move_to_end(user_id)
+        return state
+
+    async def save(self, user_id: str, state: TrainingState):
+        self._states[user_id] = state
+        self._states.move_to_end(user_id)
+        while len(self._states) > self.max_users:
+            self._states.popitem(last=False)
+
+    async def delete(self, user_id: str):
+        self._states.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "users": len(self._states), "max_users": self.max_users}
+
+
+class RedisTrainingStateStore(TrainingStateStore):
+    """States in Redis so every replica sees the same user; the TTL restarts on each save.
+
+    Redis failures are logged and reported as a missing state, so generation
+    falls back to the history in the request. ``record`` updates a state
+    under WATCH/MULTI, so completions recorded on different replicas at the
+    same time are all kept.
+    """
+
+    def __init__(self, redis_url: str, ttl: int = TRAINING_STATE_TTL):
+        if aioredis is None:
+            raise RuntimeError("redis package is required for the redis training state backend")
+        self.ttl = ttl
+        self._redis = aioredis.from_url(redis_url)
+
+    async def get(self, user_id: str) -> Optional[TrainingState]:
+        try:
+            data = await self._redis.get(f"training:state:{user_id}")
+        except Exception as e:
+            print(f"Error reading training state from Redis: {e}")
+            return None
+        return TrainingState.from_dict(json.loads(data)) if data is not None else None
+
+    async def save(self, user_id: str, state: TrainingState):
+        try:
+            await self._redis.set(f"training:state:{user_id}", json.dumps(state.to_dict()), ex=self.ttl)
+        except Exception as e:
+            print(f"Error writing training state to Redis: {e}")
+
+    async def delete(self, user_id: str):
+        try:
+            await self._redis.delete(f"training:state:{user_id}")
+        except Exception as e:
+            print(f"Error deleting training state from Redis: {e}")
+
+    async def record(self, user_id: str, workout: Dict[str, Any]) -> Optional[TrainingState]:
+        key = f"training:state:{user_id}"
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                while True:
+                    try:
+                        await pipe.watch(key)
+                        data = await pipe.get(key)
+                        if data is None:
+                            return None
+                        state = TrainingState.from_dict(json.loads(data))
+                        if state.record(workout):
+                            pipe.multi()
+                            pipe.set(key, json.dumps(state.to_dict()), ex=self.ttl)
+                            await pipe.execute()
+                        return state
+                    except WatchError:
+                        # Another replica changed the state first; redo on its version
+                        continue
+        except Exception as e:
+            print(f"Error recording training state in Redis: {e}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+
+def create_training_state_store() -> TrainingStateStore:
+    """Pick the training state backend from TRAINING_STATE_BACKEND (memory or redis).
+
+    The memory backend is per process, so it is refused when WEB_CONCURRENCY
+    (read by uvicorn and gunicorn as the worker count) asks for more than one.
+    """
+    backend = os.getenv("TRAINING_STATE_BACKEND", "memory")
+    if backend == "redis":
+        return RedisTrainingStateStore(os.getenv("TRAINING_STATE_REDIS_URL", os.getenv("REDIS_URL")))
+    if backend == "memory":
+        workers = int(os.getenv("WEB_CONCURRENCY") or 1)
+        if workers > 1:
+            raise ValueError(
+                f"The memory training state backend is per process and {workers} workers are configured; "
+                "set TRAINING_STATE_BACKEND=redis"
+            )
+        return InMemoryTrainingStateStore()
+    raise ValueError(f"Unknown training state backend: {backend}")
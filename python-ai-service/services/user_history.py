@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Workouts completed within this many days count as recent
+RECENT_DAYS = 7
+# Muscle fatigue from a workout fades linearly to zero over this many days
+FATIGUE_DAYS = 7
+DEFAULT_RATING = 3
+
+
+def days_since(value: Any, now: datetime) -> float:
+    """Whole days since an ISO timestamp, or NaN when it cannot be used"""
+    try:
+        completed_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, TypeError, ValueError):
+        return np.nan
+    # Offset-aware timestamps cannot be compared with the naive local clock;
+    # like unparseable dates they never count as recent
+    if completed_at.tzinfo is not None:
+        return np.nan
+    return (now - completed_at).days
+
+
+def top_exercises(exercise_scores: Dict[str, float], limit: int = 5) -> List[str]:
+    """Highest scoring exercises, ties in first-seen order"""
+    ranked = sorted(exercise_scores.items(), key=lambda item: item[1], reverse=True)
+    return [name for name, _ in ranked[:limit]]
+
+
+class UserHistory:
+    """A user's workout history flattened once into column arrays.
+
+    Per workout, in history order: ``completed_at`` (raw values),
+    ``days_ago`` (whole days, NaN when the date cannot be used or is plainly
+    older than the recent window), ``ratings`` and ``difficulties``. Per
+    performed exercise: ``exercise_workouts`` (workout position) and
+    ``exercise_names``. Muscles are only flattened for recent workouts, the
+    only ones fatigue looks at. Every metric is then a vectorized reduction
+    over these columns instead of another walk over the nested dicts.
+    """
+
+    def __init__(self, history: List[Dict[str, Any]], now: Optional[datetime] = None):
+        now = now or datetime.now()
+        count = len(history)
+
+        workout_exercises = [workout.get('exercises', []) for workout in history]
+        self.completed_at = np.fromiter(
+            (workout.get('completedAt', '') for workout in history), dtype=object, count=count
+        )
+        self.ratings = np.fromiter(
+            (workout.get('rating', DEFAULT_RATING) for workout in history), dtype=np.float64, count=count
+        )
+        self.difficulties = np.fromiter(
+            (workout.get('difficulty') for workout in history), dtype=object, count=count
+        )
+        self.exercise_workouts = np.repeat(np.arange(count), [len(exercises) for exercises in workout_exercises])
+        self.exercise_names = np.fromiter(
+            (exercise.get('name', '') for exercises in workout_exercises for exercise in exercises),
+            dtype=object, count=len(self.exercise_workouts)
+        )
+
+        # Extended ISO dates sort like the dates themselves, so anything that
+        # compares below the window start is old without being parsed
+        window_start = (now - timedelta(days=RECENT_DAYS + 1)).date().isoformat()
+        self.days_ago = np.full(count, np.nan)
+        for position, value in enumerate(self.completed_at.tolist()):
+            if isinstance(value, str) and value >= window_start:
+                self.days_ago[position] = days_since(value, now)
+        self.recent = np.flatnonzero(self.days_ago <= RECENT_DAYS)
+
+        muscle_workouts, muscles = [], []
+        for position in self.recent.tolist():
+            for exercise in workout_exercises[position]:
+                for muscle in exercise.get('target_muscles', []):
+                    muscle_workouts.append(position)
+                    muscles.append(muscle)
+        self.muscle_workouts = np.array(muscle_workouts, dtype=np.int64)
+        self.muscles = np.fromiter(muscles, dtype=object, count=len(muscles))
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+    @property
+    def recent_count(self) -> int:
+        return len(self.recent)
+
+    def muscle_fatigue(self) -> Dict[str, float]:
+        """Fatigue per muscle: each recent workout adds a share that fades over FATIGUE_DAYS"""
+        if not len(self.muscles):
+            return {}
+
+        factors = np.maximum(0, 1 - self.days_ago / FATIGUE_DAYS)
+        # Codes in first-seen order, and bincount adds in row order, so totals
+        # match a sequential sum exactly. Only recent muscles get here, so a
+        # dict is cheap, and unlike factorize it keeps a null muscle as None
+        muscle_codes: Dict[Any, int] = {}
+        codes = np.fromiter(
+            (muscle_codes.setdefault(muscle, len(muscle_codes)) for muscle in self.muscles.tolist()),
+            dtype=np.int64, count=len(self.muscles)
+        )
+        totals = np.bincount(codes, weights=factors[self.muscle_workouts], minlength=len(muscle_codes))
+        return dict(zip(muscle_codes, totals.tolist()))
+
+    def exercise_scores(self) -> Dict[str, float]:
+        """Summed workout rating per named exercise, in first-seen order"""
+        codes, names = pd.factorize(self.exercise_names)
+        # Null names get code -1; like other unnamed exercises they are never preferred
+        named = codes >= 0
+        scores = np.bincount(
+            codes[named], weights=self.ratings[self.exercise_workouts[named]], minlength=len(names)
+        )
+        return {name: score for name, score in zip(names.tolist(), scores.tolist()) if name}
+
+    def preferred_exercises(self, limit: int = 5) -> List[str]:
+        return top_exercises(self.exercise_scores(), limit)
+
+    def recovery_needed(self) -> bool:
+        """Four or more recent workouts, or back-to-back advanced sessions"""
+        if self.recent_count >= 4:
+            return True
+
+        # Newest first; equal timestamps keep history order
+        completed_at = self.completed_at[self.recent]
+        order = self.recent[len(completed_at) - 1 - np.argsort(completed_at[::-1], kind='stable')[::-1]]
+        advanced = self.difficulties[order] == 'advanced'
+        return bool(np.any(advanced[1:] & advanced[:-1]))
+
+    def progression_ready(self) -> bool:
+        """At least three workouts and an average rating of 4+ over the last three"""
+        if len(self) < 3:
+            return False
+
+        return self.ratings[-3:].sum() / 3 >= 4.0
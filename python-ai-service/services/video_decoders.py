@@ -0,0 +1,213 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:  # pragma: no cover - PyAV is optional at runtime
+    av = None
+
+from services.frame_preprocessing import DEFAULT_MAX_LONG_EDGE
+
+DEFAULT_DECODER = os.getenv("FORM_ANALYSIS_DECODER", "opencv")
+# 0 lets the decoding library pick a thread count for the host
+DECODE_THREADS = int(os.getenv("FORM_ANALYSIS_DECODE_THREADS", 0))
+HW_DECODE = os.getenv("FORM_ANALYSIS_HW_DECODE", "false").lower() == "true"
+KEYFRAMES_ONLY = os.getenv("FORM_ANALYSIS_KEYFRAMES_ONLY", "false").lower() == "true"
+RAW_FRAMES_FPS = float(os.getenv("FORM_ANALYSIS_RAW_FPS", 30))
+
+
+class VideoDecoder(ABC):
+    """Sequential frame source for pose extraction.
+
+    ``fps`` and ``frame_count`` are read once when the video is opened.
+    ``grab`` advances past a frame without converting it, ``read`` returns
+    the next frame (BGR, or RGB when ``output_rgb`` is set) or None at the
+    end, and ``position`` is the source frame index of the last frame
+    grabbed or read, which jumps when ``keyframes_only`` decode skips frames.
+    """
+
+    output_rgb = False
+    keyframes_only = False
+
+    def __init__(self):
+        self.fps = 30.0
+        self.frame_count = 0
+        self.position = -1
+
+    @abstractmethod
+    def grab(self) -> bool:
+        ...
+
+    @abstractmethod
+    def read(self) -> Optional[np.ndarray]:
+        ...
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class OpenCVDecoder(VideoDecoder):
+    """cv2.VideoCapture with multi-threaded and optionally hardware-accelerated decode"""
+
+    def __init__(self, video_path: str, threads: int = DECODE_THREADS, hw_accel: bool = HW_DECODE):
+        super().__init__()
+        params = []
+        if threads and hasattr(cv2, "CAP_PROP_N_THREADS"):
+            params += [cv2.CAP_PROP_N_THREADS, threads]
+        if hw_accel and hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+            params += [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+
+        self._cap = cv2.VideoCapture(video_path, cv2.CAP_ANY, params) if params else cv2.VideoCapture(video_path)
+        if not self._cap.isOpened():
+            raise ValueError("Could not open video file")
+
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def grab(self) -> bool:
+        if not self._cap.grab():
+            return False
+        self.position += 1
+        return True
+
+    def read(self) -> Optional[np.ndarray]:
+        ret, frame = self._cap.read()
+        if not ret:
+            return None
+        self.position += 1
+        return frame
+
+    def release(self):
+        self._cap.release()
+
+
+class PyAVDecoder(VideoDecoder):
+    """FFmpeg decode through PyAV.
+
+    Frames are scaled and converted straight to RGB in one swscale pass, so
+    no separate resize or color conversion is needed. With
+    ``keyframes_only`` the codec skips every non-key frame, which is much
+    cheaper but only suits sampled analysis of long clips.
+    """
+
+    output_rgb = True
+
+    def __init__(
+        self,
+        video_path: str,
+        max_long_edge: Optional[int] = None,
+        threads: int = DECODE_THREADS,
+        keyframes_only: bool = KEYFRAMES_ONLY
+    ):
+        super().__init__()
+        if av is None:
+            raise RuntimeError("av package is required for the pyav decoder")
+
+        try:
+            self._container = av.open(video_path)
+        except (OSError, av.error.FFmpegError):
+            raise ValueError("Could not open video file")
+        if not self._container.streams.video:
+            self._container.close()
+            raise ValueError("Could not open video file")
+
+        stream = self._container.streams.video[0]
+        stream.thread_type = "AUTO"
+        if threads:
+            stream.thread_count = threads
+        if keyframes_only:
+            stream.codec_context.skip_frame = "NONKEY"
+
+        self.keyframes_only = keyframes_only
+        self.max_long_edge = max_long_edge or DEFAULT_MAX_LONG_EDGE
+        self.fps = float(stream.average_rate or stream.guessed_rate or 30.0)
+        self.frame_count = stream.frames
+        if not self.frame_count and stream.duration:
+            self.frame_count = int(float(stream.duration * stream.time_base) * self.fps)
+        self._frames = self._container.decode(stream)
+        self._size = None
+
+    def _next(self):
+        frame = next(self._frames, None)
+        if frame is None:
+            return None
+
+        # Timestamps keep frame indices right when frames are skipped
+        if frame.time is not None:
+            self.position = int(round(frame.time * self.fps))
+        else:
+            self.position += 1
+        return frame
+
+    def grab(self) -> bool:
+        return self._next() is not None
+
+    def read(self) -> Optional[np.ndarray]:
+        frame = self._next()
+        if frame is None:
+            return None
+
+        if self._size is None:
+            scale = min(1.0, self.max_long_edge / max(frame.width, frame.height))
+            self._size = (max(1, int(round(frame.width * scale))), max(1, int(round(frame.height * scale))))
+
+        width, height = self._size
+        return frame.to_ndarray(format="rgb24", width=width, height=height)
+
+    def release(self):
+        self._container.close()
+
+
+class RawFrameDecoder(VideoDecoder):
+    """Frames from a ``(frames, height, width, 3)`` uint8 BGR ``.npy`` file.
+
+    Skips codec work entirely, for tests and benchmarks of the rest of the
+    pipeline. The file is memory-mapped so large clips are not loaded up front.
+    """
+
+    def __init__(self, video_path: str = None, frames: np.ndarray = None, fps: float = RAW_FRAMES_FPS):
+        super().__init__()
+        if frames is None:
+            try:
+                frames = np.load(video_path, mmap_mode="r")
+            except (OSError, ValueError):
+                raise ValueError("Could not open video file")
+        if frames.ndim != 4 or frames.shape[-1] != 3:
+            raise ValueError("Raw frames must have shape (frames, height, width, 3)")
+
+        self._frames = frames
+        self.fps = fps
+        self.frame_count = len(frames)
+
+    def grab(self) -> bool:
+        if self.position + 1 >= self.frame_count:
+            return False
+        self.position += 1
+        return True
+
+    def read(self) -> Optional[np.ndarray]:
+        if not self.grab():
+            return None
+        return np.ascontiguousarray(self._frames[self.position])
+
+
+def create_decoder(video_path: str, backend: Optional[str] = None, max_long_edge: Optional[int] = None) -> VideoDecoder:
+    """Open a video with the configured decoder backend (FORM_ANALYSIS_DECODER)"""
+    backend = backend or DEFAULT_DECODER
+    if backend == "opencv":
+        return OpenCVDecoder(video_path)
+    if backend == "pyav":
+        return PyAVDecoder(video_path, max_long_edge=max_long_edge)
+    if backend == "raw":
+        return RawFrameDecoder(video_path)
+    raise ValueError(f"Unknown video decoder backend: {backend}")
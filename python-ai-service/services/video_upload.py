@@ -0,0 +1,112 @@
+import hashlib
+import os
+import tempfile
+from typing import Iterable, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("FORM_ANALYSIS_MAX_UPLOAD_MB", 100)) * 1024 * 1024
+MAX_VIDEO_SECONDS = float(os.getenv("FORM_ANALYSIS_MAX_DURATION", 120))
+
+
+class VideoTooLarge(Exception):
+    """Raised when an upload exceeds the configured size or duration limit"""
+
+
+async def spool_upload(
+    upload,
+    max_bytes: Optional[int] = None,
+    suffix: str = ".mp4"
+) -> Tuple[str, str]:
+    """Stream an upload to a temporary file chunk by chunk.
+
+    Memory use stays at one chunk regardless of video size, and the size limit
+    is enforced as bytes arrive rather than after the whole body is buffered.
+    Returns the temp file path and the SHA-256 of its content.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    written = 0
+    digest = hashlib.sha256()
+
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        with temp_file:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                written += len(chunk)
+                if written > max_bytes:
+                    raise VideoTooLarge(
+                        f"Video exceeds maximum upload size of {max_bytes // (1024 * 1024)} MB"
+                    )
+                digest.update(chunk)
+                temp_file.write(chunk)
+    except BaseException:
+        os.unlink(temp_file.name)
+        raise
+
+    return temp_file.name, digest.hexdigest()
+
+
+class UploadLimitMiddleware:
+    """Reject request bodies over ``max_bytes`` on the given paths.
+
+    A declared Content-Length over the limit is rejected before any of the
+    body is read. Bodies without one (chunked uploads) are counted as they
+    arrive: once past the limit the app sees a client disconnect, whatever
+    it would have answered is dropped and a 413 is sent instead.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if exceeded:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+
+        if exceeded and not response_started:
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(status_code=413, content={"detail": "Video file too large"})
+        await response(scope, receive, send)
@@ -1,14 +1,37 @@
+import copy
+import os
 import random
 import json
-from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Any, Optional
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
+
+from services.exercise_catalog import ExerciseCatalog
+from services.exercise_index import ExerciseIndex
+from services.exercise_selection import SETS_BY_DIFFICULTY, plan_exercises, rest_seconds
+from services.result_cache import AnalysisCache, fingerprint
+from services.training_state import TrainingState
+from services.user_history import UserHistory
+
+MAX_BULK_WORKOUTS = int(os.getenv("WORKOUT_BULK_MAX", 1000))
+# Twelve-week programs
+MAX_PROGRAM_DAYS = 84
+# Bump when selection or structuring changes so cached workouts are regenerated
+GENERATOR_VERSION = 2
+
+# Seeds for requests without one come from the OS, never the shared global RNG
+_seed_source = random.SystemRandom()
+
+def new_seed() -> int:
+    return _seed_source.getrandbits(32)
+
+class BulkTooLarge(Exception):
+    """Raised when a bulk generation asks for more workouts than allowed"""
 
 class WorkoutGenerator:
-    def __init__(self):
-        self.exercise_database = self._load_exercise_database()
+    def __init__(self, result_cache: AnalysisCache = None):
+        self.catalog = ExerciseCatalog()
+        self.result_cache = result_cache
         self.workout_templates = self._load_workout_templates()
         self.muscle_groups = {
             'chest': ['pectorals', 'anterior_deltoids'],
@@ -19,102 +42,14 @@ class WorkoutGenerator:
             'core': ['abs', 'obliques', 'lower_back']
         }
         
-    def _load_exercise_database(self) -> Dict[str, Any]:
-        """Load comprehensive exercise database"""
-        return {
-            "push_up": {
-                "name": "Push-up",
-                "category": "chest",
-                "target_muscles": ["pectorals", "triceps", "anterior_deltoids"],
-                "difficulty": "beginner",
-                "equipment": [],
-                "instructions": [
-                    "Start in plank position with hands shoulder-width apart",
-                    "Lower body until chest nearly touches floor",
-                    "Push back up to starting position",
-                    "Keep core engaged throughout movement"
-                ],
-                "tips": [
-                    "Keep your body in a straight line",
-                    "Don't let hips sag or pike up",
-                    "Control the descent"
-                ],
-                "form_checkpoints": [
-                    {
-                        "name": "body_alignment",
-                        "description": "Maintain straight line from head to heels",
-                        "key_points": ["straight_back", "engaged_core", "neutral_neck"]
-                    },
-                    {
-                        "name": "hand_position",
-                        "description": "Hands positioned correctly",
-                        "key_points": ["shoulder_width", "under_shoulders", "fingers_forward"]
-                    }
-                ],
-                "variations": ["incline", "decline", "diamond", "wide_grip"],
-                "calories_per_minute": 8.5
-            },
-            "squat": {
-                "name": "Squat",
-                "category": "legs",
-                "target_muscles": ["quadriceps", "glutes", "hamstrings"],
-                "difficulty": "beginner",
-                "equipment": [],
-                "instructions": [
-                    "Stand with feet shoulder-width apart",
-                    "Lower body by bending knees and hips",
-                    "Descend until thighs are parallel to floor",
-                    "Drive through heels to return to start"
-                ],
-                "tips": [
-                    "Keep chest up and core engaged",
-                    "Don't let knees cave inward",
-                    "Weight should be on heels"
-                ],
-                "form_checkpoints": [
-                    {
-                        "name": "knee_tracking",
-                        "description": "Knees track over toes",
-                        "key_points": ["no_valgus", "proper_alignment", "stable_base"]
-                    },
-                    {
-                        "name": "depth",
-                        "description": "Adequate squat depth",
-                        "key_points": ["hip_crease_below_knee", "full_range", "controlled_descent"]
-                    }
-                ],
-                "variations": ["goblet", "front", "overhead", "single_leg"],
-                "calories_per_minute": 9.2
-            },
-            "plank": {
-                "name": "Plank",
-                "category": "core",
-                "target_muscles": ["abs", "obliques", "lower_back"],
-                "difficulty": "beginner",
-                "equipment": [],
-                "instructions": [
-                    "Start in forearm plank position",
-                    "Keep body in straight line",
-                    "Engage core and glutes",
-                    "Hold position for specified time"
-                ],
-                "tips": [
-                    "Don't hold your breath",
-                    "Keep hips level",
-                    "Engage entire core"
-                ],
-                "form_checkpoints": [
-                    {
-                        "name": "alignment",
-                        "description": "Proper body alignment",
-                        "key_points": ["straight_line", "no_sagging", "level_hips"]
-                    }
-                ],
-                "variations": ["side", "reverse", "single_arm", "single_leg"],
-                "calories_per_minute": 5.8
-            }
-            # Add more exercises...
-        }
+    @property
+    def exercise_database(self) -> Dict[str, Any]:
+        """Exercise records by id, from the shared catalog file"""
+        return self.catalog.exercises
+    
+    @property
+    def exercise_index(self) -> ExerciseIndex:
+        return self.catalog.index
     
     def _load_workout_templates(self) -> Dict[str, Any]:
         """Load workout templates for different goals"""
@@ -145,17 +80,187 @@ class WorkoutGenerator:
         duration: int = 45,
         difficulty: str = "intermediate",
         equipment: List[str] = None,
-        user_history: List[Dict] = None
+        user_history: List[Dict] = None,
+        training_state: TrainingState = None,
+        seed: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Generate personalized workout using AI algorithms"""
+        """Generate personalized workout using AI algorithms.
+
+        When the user's ``training_state`` is given it is used in place of
+        ``user_history``. The same ``seed`` and inputs always give the same
+        workout, and seeded workouts are served from the result cache;
+        without one a fresh seed is drawn and returned with the workout.
+        """
         
         if equipment is None:
             equipment = []
         if user_history is None:
             user_history = []
+        
+        # Catalog edits are picked up off the event loop, for later requests
+        self.catalog.refresh_in_background()
             
         # Analyze user patterns and preferences
-        workout_analysis = self._analyze_user_patterns(user_history, user_preferences)
+        if training_state is not None:
+            workout_analysis = training_state.analysis()
+        else:
+            workout_analysis = self._analyze_user_patterns(user_history, user_preferences)
+        
+        # The analysis stands in for history or state: it is all of them the
+        # workout depends on, so equal analyses share a cache entry
+        result_key = None
+        if seed is not None and self.result_cache is not None:
+            result_key = fingerprint(
+                user_preferences, duration, difficulty, equipment, workout_analysis, seed,
+                self.catalog.version, GENERATOR_VERSION
+            )
+            cached = await self.result_cache.get(result_key)
+            if cached is not None:
+                return cached
+        
+        index = self.exercise_index
+        workout = self._build_workout(
+            user_preferences, duration, difficulty, equipment, workout_analysis,
+            index, index.available(equipment, difficulty), new_seed() if seed is None else seed
+        )
+        
+        if result_key is not None:
+            await self.result_cache.set(result_key, workout)
+        
+        return workout
+    
+    def generate_batch(self, requests: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Generate independent workouts, e.g. the next session for every subscriber.
+
+        Each request holds ``generate_workout`` arguments. One catalog index
+        serves the whole batch and equipment/difficulty filtering
+        is shared by all requests with the same combination. Yields
+        ``{"index", "workout"}`` or ``{"index", "error"}`` in request order.
+        """
+        if len(requests) > MAX_BULK_WORKOUTS:
+            raise BulkTooLarge(f"Batch has {len(requests)} workouts (max {MAX_BULK_WORKOUTS})")
+        
+        def results():
+            self.catalog.refresh_in_background()
+            # One index for the whole batch, even if the catalog reloads meanwhile
+            exercise_index = self.exercise_index
+            filters = {}
+            for index, request in enumerate(requests):
+                try:
+                    equipment = request.get('equipment') or []
+                    difficulty = request.get('difficulty', 'intermediate')
+                    user_preferences = request['user_preferences']
+                    training_state = request.get('training_state')
+                    if training_state is not None:
+                        workout_analysis = training_state.analysis()
+                    else:
+                        workout_analysis = self._analyze_user_patterns(
+                            request.get('user_history') or [], user_preferences
+                        )
+                    
+                    seed = request.get('seed')
+                    workout = self._build_workout(
+                        user_preferences, request.get('duration', 45), difficulty, equipment,
+                        workout_analysis, exercise_index,
+                        self._shared_filter(filters, exercise_index, equipment, difficulty),
+                        new_seed() if seed is None else seed
+                    )
+                    yield {"index": index, "workout": workout}
+                except Exception as e:
+                    yield {"index": index, "error": str(e)}
+        
+        return results()
+    
+    def generate_program(
+        self,
+        user_preferences: Dict[str, Any],
+        days: int,
+        duration: int = 45,
+        difficulty: str = "intermediate",
+        equipment: List[str] = None,
+        user_history: List[Dict] = None,
+        training_state: TrainingState = None,
+        start_date: date = None,
+        rest_weekdays: List[int] = None,
+        seed: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Generate one user's sessions over consecutive days.
+
+        Every generated session is counted toward fatigue and recovery for
+        the days after it, as if completed on its date, so muscles trained
+        on one day are rested on the next and a dense block triggers a
+        recovery session. Sessions carry no rating, so preferences and
+        progression come from real history only. Days falling on
+        ``rest_weekdays`` (0 is Monday) are skipped. Each session gets its
+        own seed drawn from the program ``seed``. Yields ``{"day", "date",
+        "workout"}`` per session.
+        """
+        if days < 1:
+            raise ValueError("Programs cover at least one day")
+        if days > MAX_PROGRAM_DAYS:
+            raise BulkTooLarge(f"Programs cover at most {MAX_PROGRAM_DAYS} days")
+        
+        equipment = equipment or []
+        rest_weekdays = set(rest_weekdays or [])
+        # Simulated sessions must never leak into the caller's stored state
+        if training_state is not None:
+            state = copy.deepcopy(training_state)
+        else:
+            state = TrainingState.from_history(user_history or [])
+        
+        now = datetime.now()
+        first_day = datetime.combine(start_date, now.time()) if start_date else now + timedelta(days=1)
+        
+        session_seeds = random.Random(new_seed() if seed is None else seed)
+        
+        def results():
+            self.catalog.refresh_in_background()
+            # One index for the whole program, even if the catalog reloads meanwhile
+            index = self.exercise_index
+            available = index.available(equipment, difficulty)
+            for day in range(days):
+                session_time = first_day + timedelta(days=day)
+                # Drawn for rest days too, so changing them leaves other sessions alone
+                session_seed = session_seeds.getrandbits(32)
+                if session_time.weekday() in rest_weekdays:
+                    continue
+                
+                workout = self._build_workout(
+                    user_preferences, duration, difficulty, equipment,
+                    state.analysis(session_time), index, available, session_seed
+                )
+                state.record_planned({
+                    "completedAt": session_time.isoformat(),
+                    "difficulty": difficulty,
+                    "exercises": workout["exercises"]
+                }, session_time)
+                yield {"day": day, "date": session_time.date().isoformat(), "workout": workout}
+        
+        return results()
+    
+    def _shared_filter(
+        self, filters: Dict, index: ExerciseIndex, equipment: List[str], difficulty: str
+    ) -> int:
+        """Equipment/difficulty filter memoized across one batch"""
+        key = (frozenset(equipment), difficulty)
+        if key not in filters:
+            filters[key] = index.available(equipment, difficulty)
+        return filters[key]
+    
+    def _build_workout(
+        self,
+        user_preferences: Dict[str, Any],
+        duration: int,
+        difficulty: str,
+        equipment: List[str],
+        workout_analysis: Dict[str, Any],
+        index: ExerciseIndex,
+        available: int,
+        seed: int
+    ) -> Dict[str, Any]:
+        """Assemble a workout from an analysis and an index's filtered exercise bitset"""
+        # Every random choice below draws from this generator alone
+        rng = random.Random(seed)
         
         # Select workout type based on goals and recovery
         workout_type = self._select_workout_type(user_preferences, workout_analysis)
@@ -167,7 +272,10 @@ class WorkoutGenerator:
             difficulty=difficulty,
             equipment=equipment,
             user_preferences=user_preferences,
-            workout_analysis=workout_analysis
+            workout_analysis=workout_analysis,
+            rng=rng,
+            index=index,
+            available=available
         )
         
         # Calculate workout parameters
@@ -177,7 +285,7 @@ class WorkoutGenerator:
         coaching_notes = self._generate_coaching_notes(exercises, user_preferences, workout_analysis)
         
         return {
-            "name": self._generate_workout_name(workout_type, difficulty),
+            "name": self._generate_workout_name(workout_type, difficulty, rng),
             "description": self._generate_workout_description(workout_type, exercises),
             "duration": duration,
             "difficulty": difficulty,
@@ -185,9 +293,10 @@ class WorkoutGenerator:
             "exercises": exercises,
             "estimated_calories": workout_params["calories"],
             "target_muscles": workout_params["target_muscles"],
-            "equipment": list(set(equipment)),
+            "equipment": list(dict.fromkeys(equipment)),
             "coaching_notes": coaching_notes,
-            "workout_structure": workout_params["structure"]
+            "workout_structure": workout_params["structure"],
+            "seed": seed
         }
     
     def _analyze_user_patterns(self, user_history: List[Dict], preferences: Dict) -> Dict[str, Any]:
@@ -200,25 +309,15 @@ class WorkoutGenerator:
                 "progression_ready": True
             }
         
-        # Analyze recent workouts for muscle group fatigue
-        recent_workouts = [w for w in user_history if self._is_recent(w.get('completedAt', ''))]
-        muscle_fatigue = self._calculate_muscle_fatigue(recent_workouts)
-        
-        # Identify preferred exercises
-        preferred_exercises = self._identify_preferred_exercises(user_history)
-        
-        # Assess recovery needs
-        recovery_needed = self._assess_recovery_needs(recent_workouts)
-        
-        # Check progression readiness
-        progression_ready = self._check_progression_readiness(user_history)
+        # Parse the history once; every metric below is computed from its columns
+        history = UserHistory(user_history)
         
         return {
-            "muscle_fatigue": muscle_fatigue,
-            "preferred_exercises": preferred_exercises,
-            "recovery_needed": recovery_needed,
-            "progression_ready": progression_ready,
-            "workout_frequency": len(recent_workouts)
+            "muscle_fatigue": history.muscle_fatigue(),
+            "preferred_exercises": history.preferred_exercises(),
+            "recovery_needed": history.recovery_needed(),
+            "progression_ready": history.progression_ready(),
+            "workout_frequency": history.recent_count
         }
     
     def _select_workout_type(self, preferences: Dict, analysis: Dict) -> str:
@@ -249,193 +348,92 @@ class WorkoutGenerator:
         difficulty: str,
         equipment: List[str],
         user_preferences: Dict,
-        workout_analysis: Dict
+        workout_analysis: Dict,
+        rng: random.Random,
+        index: ExerciseIndex = None,
+        available: int = None
     ) -> List[Dict[str, Any]]:
         """Select and structure exercises for the workout"""
+        if index is None:
+            index = self.exercise_index
         
         # Filter exercises by equipment and difficulty
-        available_exercises = self._filter_exercises(equipment, difficulty)
+        if available is None:
+            available = self._filter_exercises(equipment, difficulty, index)
         
         # Calculate number of exercises based on duration
         num_exercises = max(4, min(8, duration // 6))
         
-        # Select exercises based on workout type
+        # Best plan of at most that many exercises fitting in the session
+        positions = plan_exercises(
+            index,
+            available,
+            num_exercises,
+            duration,
+            difficulty,
+            workout_analysis.get('muscle_fatigue', {}),
+            workout_analysis.get('preferred_exercises', []),
+            self._type_bonus(workout_type, index),
+            rng
+        )
+        
+        # Strength sessions start with compound lifts while fresh
         if workout_type == 'strength':
-            exercises = self._select_strength_exercises(
-                available_exercises, num_exercises, workout_analysis
-            )
-        elif workout_type == 'cardio':
-            exercises = self._select_cardio_exercises(
-                available_exercises, num_exercises, workout_analysis
-            )
-        else:
-            exercises = self._select_functional_exercises(
-                available_exercises, num_exercises, workout_analysis
-            )
+            positions.sort(key=lambda position: not index.compound >> position & 1)
+        
+        # Copy only the chosen records before adding per-workout fields
+        exercises = [index.exercises[position].copy() for position in positions]
         
         # Add sets and reps
         for i, exercise in enumerate(exercises):
-            exercise.update(self._calculate_sets_reps(exercise, difficulty, i))
+            exercise.update(self._calculate_sets_reps(exercise, difficulty, i, rng))
             exercise['order'] = i + 1
         
         return exercises
     
-    def _filter_exercises(self, equipment: List[str], difficulty: str) -> List[Dict]:
-        """Filter exercises based on available equipment and difficulty"""
-        filtered = []
-        
-        difficulty_levels = {
-            'beginner': ['beginner'],
-            'intermediate': ['beginner', 'intermediate'],
-            'advanced': ['beginner', 'intermediate', 'advanced']
-        }
-        
-        allowed_difficulties = difficulty_levels.get(difficulty, ['beginner'])
-        
-        for exercise_id, exercise in self.exercise_database.items():
-            # Check difficulty
-            if exercise['difficulty'] not in allowed_difficulties:
-                continue
-            
-            # Check equipment requirements
-            required_equipment = set(exercise.get('equipment', []))
-            available_equipment = set(equipment)
-            
-            if required_equipment.issubset(available_equipment) or not required_equipment:
-                filtered.append(exercise.copy())
-        
-        return filtered
+    def _filter_exercises(
+        self, equipment: List[str], difficulty: str, index: ExerciseIndex = None
+    ) -> int:
+        """Bitset of exercises matching the available equipment and difficulty"""
+        if index is None:
+            index = self.exercise_index
+        return index.available(equipment, difficulty)
     
-    def _select_strength_exercises(
-        self, available_exercises: List[Dict], num_exercises: int, analysis: Dict
-    ) -> List[Dict]:
-        """Select exercises for strength training"""
-        exercises = []
-        muscle_fatigue = analysis.get('muscle_fatigue', {})
-        
-        # Prioritize compound movements
-        compound_exercises = [e for e in available_exercises if len(e['target_muscles']) >= 2]
-        isolation_exercises = [e for e in available_exercises if len(e['target_muscles']) < 2]
-        
-        # Select compound exercises first (60% of workout)
-        compound_count = max(2, int(num_exercises * 0.6))
-        selected_compound = self._select_by_muscle_balance(
-            compound_exercises, compound_count, muscle_fatigue
-        )
-        exercises.extend(selected_compound)
+    def _type_bonus(self, workout_type: str, index: ExerciseIndex = None) -> np.ndarray:
+        """How well each catalog exercise suits the workout type, in catalog order"""
+        if index is None:
+            index = self.exercise_index
         
-        # Fill remaining with isolation exercises
-        remaining = num_exercises - len(exercises)
-        if remaining > 0:
-            selected_isolation = self._select_by_muscle_balance(
-                isolation_exercises, remaining, muscle_fatigue
+        if workout_type == 'strength':
+            # Favor compound movements
+            return 0.75 * index.flags(index.compound)
+        
+        if workout_type == 'cardio':
+            # Favor high-calorie and cardio exercises, burn rate breaking ties
+            top_rate = index.calories_per_minute.max(initial=1)
+            return (
+                0.5 * index.flags(index.high_calorie | index.by_category.get('cardio', 0))
+                + 0.5 * index.calories_per_minute / top_rate
             )
-            exercises.extend(selected_isolation)
         
-        return exercises
+        # Functional and recovery sessions balance the main muscle groups
+        main_groups = 0
+        for group in ['chest', 'back', 'legs', 'core', 'shoulders']:
+            main_groups |= index.by_category.get(group, 0)
+        return 0.25 * index.flags(main_groups)
     
-    def _select_cardio_exercises(
-        self, available_exercises: List[Dict], num_exercises: int, analysis: Dict
-    ) -> List[Dict]:
-        """Select exercises for cardio training"""
-        # Focus on high-calorie burning exercises
-        cardio_exercises = [
-            e for e in available_exercises 
-            if e.get('calories_per_minute', 0) > 7 or e['category'] == 'cardio'
-        ]
-        
-        if len(cardio_exercises) < num_exercises:
-            cardio_exercises.extend(available_exercises)
-        
-        # Select diverse movement patterns
-        selected = []
-        movement_patterns = set()
-        
-        for exercise in cardio_exercises:
-            if len(selected) >= num_exercises:
-                break
-            
-            pattern = exercise['category']
-            if pattern not in movement_patterns or len(movement_patterns) >= 3:
-                selected.append(exercise)
-                movement_patterns.add(pattern)
-        
-        return selected[:num_exercises]
-    
-    def _select_functional_exercises(
-        self, available_exercises: List[Dict], num_exercises: int, analysis: Dict
-    ) -> List[Dict]:
-        """Select exercises for functional training"""
-        # Balance between different muscle groups
-        muscle_groups = ['chest', 'back', 'legs', 'core', 'shoulders']
-        exercises_per_group = max(1, num_exercises // len(muscle_groups))
-        
-        selected = []
-        for group in muscle_groups:
-            group_exercises = [e for e in available_exercises if e['category'] == group]
-            if group_exercises:
-                selected.extend(random.sample(
-                    group_exercises, 
-                    min(exercises_per_group, len(group_exercises))
-                ))
-        
-        # Fill remaining slots
-        while len(selected) < num_exercises and available_exercises:
-            remaining_exercises = [e for e in available_exercises if e not in selected]
-            if remaining_exercises:
-                selected.append(random.choice(remaining_exercises))
-            else:
-                break
-        
-        return selected[:num_exercises]
-    
-    def _select_by_muscle_balance(
-        self, exercises: List[Dict], count: int, muscle_fatigue: Dict
-    ) -> List[Dict]:
-        """Select exercises while balancing muscle groups and considering fatigue"""
-        if not exercises:
-            return []
-        
-        selected = []
-        muscle_usage = {}
-        
-        # Sort exercises by muscle fatigue (less fatigued muscles first)
-        def fatigue_score(exercise):
-            muscles = exercise['target_muscles']
-            return sum(muscle_fatigue.get(muscle, 0) for muscle in muscles) / len(muscles)
-        
-        sorted_exercises = sorted(exercises, key=fatigue_score)
-        
-        for exercise in sorted_exercises:
-            if len(selected) >= count:
-                break
-            
-            # Check muscle balance
-            muscles = exercise['target_muscles']
-            current_usage = sum(muscle_usage.get(muscle, 0) for muscle in muscles)
-            
-            if current_usage < 2:  # Limit muscle group usage
-                selected.append(exercise)
-                for muscle in muscles:
-                    muscle_usage[muscle] = muscle_usage.get(muscle, 0) + 1
-        
-        return selected
-    
-    def _calculate_sets_reps(self, exercise: Dict, difficulty: str, exercise_index: int) -> Dict:
+    def _calculate_sets_reps(
+        self, exercise: Dict, difficulty: str, exercise_index: int, rng: random.Random
+    ) -> Dict:
         """Calculate sets and reps for an exercise"""
-        base_sets = {
-            'beginner': 2,
-            'intermediate': 3,
-            'advanced': 4
-        }
-        
         base_reps = {
             'beginner': (8, 12),
             'intermediate': (10, 15),
             'advanced': (12, 20)
         }
         
-        sets = base_sets.get(difficulty, 3)
+        # Sets and rest match the time budget exercises were planned with
+        sets = SETS_BY_DIFFICULTY.get(difficulty, 3)
         rep_range = base_reps.get(difficulty, (10, 15))
         
         # Adjust for exercise type
@@ -447,11 +445,11 @@ class WorkoutGenerator:
         # Generate sets
         exercise_sets = []
         for i in range(sets):
-            reps = random.randint(rep_range[0], rep_range[1])
+            reps = rng.randint(rep_range[0], rep_range[1])
             exercise_sets.append({
                 'type': 'reps',
                 'reps': reps,
-                'rest_time': 60 if exercise['category'] == 'core' else 90
+                'rest_time': rest_seconds(exercise['category'])
             })
         
         return {
@@ -462,7 +460,8 @@ class WorkoutGenerator:
     def _calculate_workout_parameters(self, exercises: List[Dict], duration: int, difficulty: str) -> Dict:
         """Calculate overall workout parameters"""
         total_calories = 0
-        target_muscles = set()
+        # First-seen order rather than a set, whose order varies between processes
+        target_muscles = {}
         
         for exercise in exercises:
             # Calculate calories for this exercise
@@ -471,7 +470,7 @@ class WorkoutGenerator:
             total_calories += exercise_duration * calories_per_min
             
             # Collect target muscles
-            target_muscles.update(exercise['target_muscles'])
+            target_muscles.update(dict.fromkeys(exercise['target_muscles']))
         
         return {
             'calories': int(total_calories),
@@ -506,7 +505,7 @@ class WorkoutGenerator:
         
         return " ".join(notes)
     
-    def _generate_workout_name(self, workout_type: str, difficulty: str) -> str:
+    def _generate_workout_name(self, workout_type: str, difficulty: str, rng: random.Random) -> str:
         """Generate creative workout name"""
         type_names = {
             'strength': ['Power', 'Strength', 'Iron', 'Force'],
@@ -524,13 +523,13 @@ class WorkoutGenerator:
         type_words = type_names.get(workout_type, ['Fitness'])
         diff_words = difficulty_modifiers.get(difficulty, [''])
         
-        return f"{random.choice(diff_words)} {random.choice(type_words)} Session"
+        return f"{rng.choice(diff_words)} {rng.choice(type_words)} Session"
     
     def _generate_workout_description(self, workout_type: str, exercises: List[Dict]) -> str:
         """Generate workout description"""
-        muscle_groups = set()
+        muscle_groups = {}
         for exercise in exercises:
-            muscle_groups.update(exercise['target_muscles'])
+            muscle_groups.update(dict.fromkeys(exercise['target_muscles']))
         
         primary_muscles = list(muscle_groups)[:3]
         muscle_text = ", ".join(primary_muscles).replace('_', ' ')
@@ -543,73 +542,3 @@ class WorkoutGenerator:
         }
         
         return descriptions.get(workout_type, f"Balanced workout targeting {muscle_text}")
-    
-    def _is_recent(self, date_str: str, days: int = 7) -> bool:
-        """Check if date is within recent days"""
-        try:
-            workout_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            return (datetime.now() - workout_date).days <= days
-        except:
-            return False
-    
-    def _calculate_muscle_fatigue(self, recent_workouts: List[Dict]) -> Dict[str, float]:
-        """Calculate muscle fatigue based on recent workouts"""
-        fatigue = {}
-        
-        for workout in recent_workouts:
-            days_ago = self._days_since_workout(workout.get('completedAt', ''))
-            fatigue_factor = max(0, 1 - (days_ago / 7))  # Fatigue decreases over 7 days
-            
-            for exercise in workout.get('exercises', []):
-                for muscle in exercise.get('target_muscles', []):
-                    fatigue[muscle] = fatigue.get(muscle, 0) + fatigue_factor
-        
-        return fatigue
-    
-    def _days_since_workout(self, date_str: str) -> int:
-        """Calculate days since workout"""
-        try:
-            workout_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            return (datetime.now() - workout_date).days
-        except:
-            return 7
-    
-    def _identify_preferred_exercises(self, history: List[Dict]) -> List[str]:
-        """Identify user's preferred exercises based on ratings and frequency"""
-        exercise_scores = {}
-        
-        for workout in history:
-            rating = workout.get('rating', 3)
-            for exercise in workout.get('exercises', []):
-                name = exercise.get('name', '')
-                if name:
-                    exercise_scores[name] = exercise_scores.get(name, 0) + rating
-        
-        # Sort by score and return top exercises
-        sorted_exercises = sorted(exercise_scores.items(), key=lambda x: x[1], reverse=True)
-        return [name for name, score in sorted_exercises[:5]]
-    
-    def _assess_recovery_needs(self, recent_workouts: List[Dict]) -> bool:
-        """Assess if user needs recovery based on recent activity"""
-        if len(recent_workouts) >= 4:  # 4+ workouts in last week
-            return True
-        
-        # Check for consecutive high-intensity days
-        consecutive_days = 0
-        for workout in sorted(recent_workouts, key=lambda x: x.get('completedAt', ''), reverse=True):
-            if workout.get('difficulty') == 'advanced':
-                consecutive_days += 1
-                if consecutive_days >= 2:
-                    return True
-            else:
-                consecutive_days = 0
-        
-        return False
-    
-    def _check_progression_readiness(self, history: List[Dict]) -> bool:
-        """Check if user is ready for progression"""
-        if len(history) < 3:
-            return False
-        
-        recent_ratings = [w.get('rating', 3) for w in history[-3:]]
-        return sum(recent_ratings) / len(recent_ratings) >= 4.0
\ No newline at end of file
@@ -0,0 +1,89 @@
+import random
+
+import numpy as np
+import pytest
+
+from services.exercise_index import ExerciseIndex
+from services.exercise_selection import SETS_BY_DIFFICULTY, WORK_SECONDS_PER_SET, plan_exercises, rest_seconds
+
+CATEGORIES = ['chest', 'back', 'legs', 'shoulders', 'arms', 'core']
+MUSCLES = ['pectorals', 'triceps', 'biceps', 'lats', 'quadriceps', 'glutes', 'hamstrings', 'deltoids', 'abs', 'obliques']
+
+
+def synthetic_catalog(size, seed=0):
+    rng = random.Random(seed)
+    return {
+        f"exercise_{i}": {
+            "name": f"Exercise {i}",
+            "category": rng.choice(CATEGORIES),
+            "target_muscles": rng.sample(MUSCLES, rng.randint(1, 3)),
+            "difficulty": rng.choice(['beginner', 'intermediate', 'advanced']),
+            "equipment": rng.sample(['dumbbells', 'bench', 'barbell'], rng.randint(0, 1)),
+            "calories_per_minute": rng.uniform(3, 10)
+        }
+        for i in range(size)
+    }
+
+
+def exercise_minutes(index, position, difficulty):
+    rest = rest_seconds(index.exercises[position]["category"])
+    return SETS_BY_DIFFICULTY[difficulty] * (WORK_SECONDS_PER_SET + rest) / 60
+
+
+def plan(index, candidates, count, minutes, difficulty='intermediate', seed=0, muscle_fatigue=None, time_limit_ms=25):
+    return plan_exercises(
+        index, candidates, count, minutes, difficulty, muscle_fatigue or {}, [],
+        np.zeros(len(index.exercises)), random.Random(seed), time_limit_ms
+    )
+
+
+@pytest.mark.parametrize("size", [5, 40, 300])
+@pytest.mark.parametrize("difficulty", ['beginner', 'intermediate', 'advanced'])
+@pytest.mark.parametrize("minutes", [3, 15, 45, 90])
+@pytest.mark.parametrize("time_limit_ms", [0, 25])
+def test_plan_fits_the_budget_without_repeats(size, difficulty, minutes, time_limit_ms):
+    index = ExerciseIndex(synthetic_catalog(size, seed=size))
+    candidates = index.available(['dumbbells'], difficulty)
+    picks = plan(index, candidates, 8, minutes, difficulty, seed=minutes, time_limit_ms=time_limit_ms)
+
+    assert len(picks) == len(set(picks))
+    assert 1 <= len(picks) <= 8
+    assert all(candidates >> position & 1 for position in picks)
+    total = sum(exercise_minutes(index, position, difficulty) for position in picks)
+    # A budget shorter than any exercise still gets exactly one
+    assert total <= minutes + 1e-9 or len(picks) == 1
+
+
+def test_fills_the_requested_count_when_time_allows():
+    index = ExerciseIndex(synthetic_catalog(60))
+    picks = plan(index, index.all, 6, 240)
+    assert len(picks) == 6
+    assert len(set(picks)) == 6
+
+
+def test_never_picks_more_than_the_candidates():
+    index = ExerciseIndex(synthetic_catalog(60))
+    candidates = sum(1 << position for position in (3, 17, 42))
+    picks = plan(index, candidates, 10, 240)
+    assert sorted(picks) == [3, 17, 42]
+
+
+def test_no_candidates_or_no_count():
+    index = ExerciseIndex(synthetic_catalog(20))
+    assert plan(index, 0, 5, 60) == []
+    assert plan(index, index.all, 0, 60) == []
+
+
+def test_same_seed_same_plan():
+    index = ExerciseIndex(synthetic_catalog(200))
+    assert plan(index, index.all, 8, 60, seed=5) == plan(index, index.all, 8, 60, seed=5)
+
+
+def test_fully_fatigued_muscles_are_avoided():
+    catalog = {
+        "curl": {"name": "Curl", "category": "arms", "target_muscles": ["biceps"], "difficulty": "beginner"},
+        "squat": {"name": "Squat", "category": "legs", "target_muscles": ["quadriceps"], "difficulty": "beginner"},
+    }
+    index = ExerciseIndex(catalog)
+    picks = plan(index, index.all, 1, 60, muscle_fatigue={"biceps": 1.0})
+    assert picks == [index.positions["squat"]]
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from services.rep_detection import RepDetector, smooth_angles
+
+FPS = 30
+
+
+def sine_track(reps: int, period: float = 2.0, amplitude: float = 40.0, noise: float = 0.0, seed: int = 0):
+    """A key angle starting extended (top) and bending ``reps`` times"""
+    timestamps = np.arange(int(reps * period * FPS) + 1) / FPS
+    angles = 130 + amplitude * np.cos(2 * np.pi * timestamps / period)
+    if noise:
+        angles += np.random.default_rng(seed).normal(0, noise, len(angles))
+    return timestamps, angles
+
+
+def streamed_reps(timestamps, angles):
+    detector = RepDetector()
+    for index, (timestamp, angle) in enumerate(zip(timestamps.tolist(), angles.tolist())):
+        detector.update(index, timestamp, angle)
+    return detector.reps
+
+
+def assert_same_reps(batch, streamed):
+    assert len(batch) == len(streamed)
+    for a, b in zip(batch, streamed):
+        assert (a["start"], a["bottom"], a["end"]) == (b["start"], b["bottom"], b["end"])
+        for key in ("start_time", "bottom_time", "end_time"):
+            assert a[key] == pytest.approx(b[key])
+
+
+@pytest.mark.parametrize("reps", [1, 3, 5, 12])
+def test_counts_reps_on_sine_track(reps):
+    timestamps, angles = sine_track(reps)
+    assert len(RepDetector().detect_reps(timestamps, angles)) == reps
+
+
+def test_counts_reps_through_noise():
+    timestamps, angles = sine_track(8, noise=3.0)
+    assert len(RepDetector().detect_reps(timestamps, angles)) == 8
+
+
+def test_rep_boundaries_follow_the_movement():
+    timestamps, angles = sine_track(4)
+    for n, rep in enumerate(RepDetector().detect_reps(timestamps, angles)):
+        assert rep["start_time"] < rep["bottom_time"] < rep["end_time"]
+        # The bottom lands near the cosine minimum, delayed a little by smoothing
+        assert rep["bottom_time"] == pytest.approx(2 * n + 1, abs=0.2)
+
+
+@pytest.mark.parametrize("angles", [
+    np.full(300, 150.0),
+    150 + np.random.default_rng(1).normal(0, 2, 300),
+    130 + 5 * np.cos(np.linspace(0, 10 * np.pi, 300)),
+])
+def test_no_reps_without_a_real_movement(angles):
+    timestamps = np.arange(len(angles)) / FPS
+    assert RepDetector().detect_reps(timestamps, angles) == []
+
+
+def test_too_fast_bends_are_not_reps():
+    timestamps, angles = sine_track(10, period=0.3)
+    assert RepDetector().detect_reps(timestamps, angles) == []
+
+
+def test_all_missing_samples():
+    assert RepDetector().detect_reps(np.arange(10) / FPS, np.full(10, np.nan)) == []
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_detect_reps_matches_update(seed):
+    rng = np.random.default_rng(seed)
+    # Irregular gaps as adaptive sampling produces, with dropped detections
+    timestamps = np.cumsum(rng.choice([1, 1, 1, 2, 4], 400) / FPS)
+    period = rng.uniform(1.0, 3.0)
+    angles = 130 + rng.uniform(20, 50) * np.cos(2 * np.pi * timestamps / period)
+    angles += rng.normal(0, rng.uniform(0, 6), len(angles))
+    angles[rng.random(len(angles)) < 0.1] = np.nan
+
+    assert_same_reps(RepDetector().detect_reps(timestamps, angles), streamed_reps(timestamps, angles))
+
+
+def test_smooth_angles_is_a_trailing_mean():
+    rng = np.random.default_rng(7)
+    timestamps = np.cumsum(rng.uniform(0.01, 0.1, 200))
+    angles = rng.uniform(60, 180, 200)
+    expected = [
+        angles[(timestamps > t - 0.2) & (timestamps <= t)].mean() for t in timestamps
+    ]
+    assert smooth_angles(timestamps, angles, 0.2) == pytest.approx(expected)